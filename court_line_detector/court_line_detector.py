@@ -1,48 +1,83 @@
-import torch
-import torchvision.transforms as transforms
+import logging
 import cv2
-from torchvision import models
-import numpy as np
+import sys
+sys.path.append('../')
+from model_optimization import find_optimized_model, artifact_supports_input_size, OnnxModel
+from utils import as_inference_frame, scale_keypoints_to_original
+
+logger = logging.getLogger(__name__)
 
 class CourtLineDetector:
-    def __init__(self, model_path):
-        # Load ResNet model with new weights argument
-        self.model = models.resnet50(weights=models.ResNet50_Weights.DEFAULT)
-        self.model.fc = torch.nn.Linear(self.model.fc.in_features, 14 * 2) 
-        self.model.load_state_dict(torch.load(model_path, map_location='cpu'))
-        
+    def __init__(self, model_path, optimized_model_path=None, use_optimized=False, input_size=224):
+        # torch is only imported once a court model is constructed
+        import torch
+        import torchvision.transforms as transforms
+        from torchvision import models
+
+        # The model was trained on 224x224 inputs
+        self.input_size = input_size
+
+        if optimized_model_path is None and use_optimized:
+            optimized_model_path = find_optimized_model(model_path, self.input_size)
+        elif optimized_model_path is not None and not artifact_supports_input_size(optimized_model_path, self.input_size):
+            # Exported for another input size, the weights run at any size
+            logger.warning(f"{optimized_model_path} does not take {self.input_size}x{self.input_size} inputs, "
+                           f"using {model_path}")
+            optimized_model_path = None
+
+        if optimized_model_path is None:
+            # Every weight comes from the state dict, skip loading the ImageNet weights
+            self.model = models.resnet50(weights=None)
+            self.model.fc = torch.nn.Linear(self.model.fc.in_features, 14 * 2)
+            self.model.load_state_dict(torch.load(model_path, map_location='cpu'))
+        elif optimized_model_path.endswith('.onnx'):
+            logger.info(f"Using optimized court model {optimized_model_path}")
+            self.model = OnnxModel(optimized_model_path)
+        else:
+            logger.info(f"Using optimized court model {optimized_model_path}")
+            self.model = torch.jit.load(optimized_model_path, map_location='cpu')
+        # Inference only, batch norm has to use the running statistics
+        self.model.eval()
+
         self.transform = transforms.Compose([
             transforms.ToPILImage(),
-            transforms.Resize((224, 224)),
+            transforms.Resize((self.input_size, self.input_size)),
             transforms.ToTensor(),
             transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
         ])
 
-    def predict(self, image):
+    def preprocess(self, image):
         # Convert BGR to RGB and apply transformations
         image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        image_tensor = self.transform(image_rgb).unsqueeze(0)
-        
+        return self.transform(image_rgb).unsqueeze(0)
+
+    def predict(self, image):
+        import torch
+
+        # Resize from the smallest copy of the frame the detectors already made
+        inference_frame = as_inference_frame(image)
+        image_tensor = self.preprocess(inference_frame.source_for(self.input_size))
+
         with torch.no_grad():
             outputs = self.model(image_tensor)
-        
+
         keypoints = outputs.squeeze().cpu().numpy()
-        
-        # Scale keypoints back to original image dimensions
-        original_h, original_w = image.shape[:2]
-        keypoints[::2] *= original_w / 224.0
-        keypoints[1::2] *= original_h / 224.0
 
-        return keypoints
+        # Scale keypoints back to original image dimensions
+        original_h, original_w = inference_frame.original_height, inference_frame.original_width
+        return scale_keypoints_to_original(keypoints, (original_w / float(self.input_size),
+                                                       original_h / float(self.input_size)))
 
-    def draw_keypoints(self, image, keypoints):
+    @staticmethod
+    def draw_keypoints(image, keypoints):
         for i in range(0, len(keypoints), 2):
             x = int(keypoints[i])
             y = int(keypoints[i + 1])
             cv2.putText(image, str(i // 2), (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
             cv2.circle(image, (x, y), 5, (0, 0, 255), -1)
         return image
-    
-    def draw_keypoints_on_video(self, video_frames, keypoints):
-        output_video_frames = [self.draw_keypoints(frame, keypoints) for frame in video_frames]
+
+    @staticmethod
+    def draw_keypoints_on_video(video_frames, keypoints):
+        output_video_frames = [CourtLineDetector.draw_keypoints(frame, keypoints) for frame in video_frames]
         return output_video_frames
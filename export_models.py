@@ -0,0 +1,57 @@
+import argparse
+from model_optimization import (export_yolo_model,
+                                export_court_model,
+                                compare_court_models,
+                                compare_yolo_models)
+from utils import sample_video_frames
+
+
+def print_comparison(comparison):
+    print(f"eager:     mean {comparison['eager']['mean_ms']:.1f} ms  p50 {comparison['eager']['p50_ms']:.1f} ms  p95 {comparison['eager']['p95_ms']:.1f} ms")
+    print(f"optimized: mean {comparison['optimized']['mean_ms']:.1f} ms  p50 {comparison['optimized']['p50_ms']:.1f} ms  p95 {comparison['optimized']['p95_ms']:.1f} ms")
+    print(f"speedup:   {comparison['speedup']:.2f}x")
+    for key in ('mean_keypoint_error_px', 'max_keypoint_error_px', 'recall', 'mean_iou'):
+        if key in comparison:
+            print(f"{key}: {comparison[key]:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a model to TorchScript/ONNX, optionally int8 quantized, "
+                                                 "and compare it against the eager model.")
+    parser.add_argument('model_type', choices=['players', 'ball', 'court'])
+    parser.add_argument('--model-path', help="Defaults to the model main.py uses for the model type")
+    parser.add_argument('--format', choices=['torchscript', 'onnx'], default='onnx')
+    parser.add_argument('--quantization', choices=['dynamic', 'static'])
+    parser.add_argument('--video', default="input_videos/1.mp4",
+                        help="Footage used for static calibration and for the comparison")
+    parser.add_argument('--num-frames', type=int, default=32)
+    parser.add_argument('--compare', action='store_true', help="Report latency and accuracy against the eager model")
+    args = parser.parse_args()
+
+    default_model_paths = {
+        'players': 'yolov8x',
+        'ball': 'models/last.pt',
+        'court': 'models/keypoints_model.pth',
+    }
+    model_path = args.model_path or default_model_paths[args.model_type]
+
+    frames = []
+    if args.quantization == 'static' or args.compare:
+        frames = sample_video_frames(args.video, args.num_frames)
+
+    if args.model_type == 'court':
+        optimized_model_path = export_court_model(model_path, args.format, args.quantization, calibration_frames=frames)
+    else:
+        optimized_model_path = export_yolo_model(model_path, args.format, args.quantization)
+    print(f"Exported {model_path} to {optimized_model_path}")
+
+    if args.compare:
+        if args.model_type == 'court':
+            comparison = compare_court_models(model_path, optimized_model_path, frames)
+        else:
+            comparison = compare_yolo_models(model_path, optimized_model_path, frames)
+        print_comparison(comparison)
+
+
+if __name__ == "__main__":
+    main()
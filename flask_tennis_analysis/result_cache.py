@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+CHUNK_SIZE = 1024 * 1024
+# Uploads are stored under the SHA-256 of their content, see save_upload
+_UPLOAD_FILE_PATTERN = re.compile(r'^[0-9a-f]{64}(\.\w+)?$')
+
+
+def save_upload(file_storage, upload_folder):
+    """
+    Streams an upload to disk while hashing it.
+
+    The file is stored under its SHA-256 instead of the client filename, so uploads
+    never overwrite each other and an identical upload is only kept once. Its
+    modification time records when it was last uploaded, see ``ResultCache.evict``.
+
+    Returns:
+        tuple: (path of the stored upload, hex SHA-256 of its content)
+    """
+    extension = os.path.splitext(file_storage.filename or '')[1].lower()
+    content_hash = hashlib.sha256()
+
+    fd, temp_path = tempfile.mkstemp(dir=upload_folder, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                content_hash.update(chunk)
+                f.write(chunk)
+
+        upload_path = os.path.join(upload_folder, content_hash.hexdigest() + extension)
+        if os.path.exists(upload_path):
+            os.remove(temp_path)
+            os.utime(upload_path)
+        else:
+            os.replace(temp_path, upload_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return upload_path, content_hash.hexdigest()
+
+
+def _get_size(path):
+    """Bytes of a file or of every file under a directory, 0 when it doesn't exist."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(dirpath, filename))
+                   for dirpath, _, filenames in os.walk(path) for filename in filenames)
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def get_cache_key(content_hash, pipeline_config, model_fingerprints=()):
+    """
+    Key of a result, changes with the uploaded content, the pipeline configuration and
+    the model files (``get_file_fingerprint`` of each file the pipeline loads).
+    """
+    config_hash = hashlib.sha256(json.dumps([pipeline_config, sorted(model_fingerprints)],
+                                            sort_keys=True).encode()).hexdigest()
+    return f"{content_hash[:32]}_{config_hash[:16]}"
+
+
+class ResultCache:
+    """
+    Rendered MP4s and stats of processed uploads, kept under a disk quota.
+
+    Each entry is ``<key>.mp4`` plus ``<key>.json`` in ``cache_folder``. The
+    modification time of the MP4 records when it was last looked up, viewed or
+    served; once the cache grows over ``max_bytes`` the least recently used entries
+    are evicted. The uploads in ``upload_folder`` count against the same quota, each
+    together with its pipeline cache, ``<content hash>/`` in ``pipeline_cache_folder``.
+    """
+
+    def __init__(self, cache_folder, max_bytes, upload_folder=None, pipeline_cache_folder=None):
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        self.upload_folder = upload_folder
+        self.pipeline_cache_folder = pipeline_cache_folder
+        os.makedirs(cache_folder, exist_ok=True)
+
+    def get_video_filename(self, key):
+        return key + '.mp4'
+
+    def get_video_path(self, key):
+        return os.path.join(self.cache_folder, self.get_video_filename(key))
+
+    def get_stats_path(self, key):
+        return os.path.join(self.cache_folder, key + '.json')
+
+    def get_pipeline_cache_dir(self, content_hash):
+        """Pipeline cache of one upload, deleted together with the upload."""
+        return os.path.join(self.pipeline_cache_folder, content_hash)
+
+    def lookup(self, key):
+        """Returns the stats of a cached result and marks it as used, or None on a miss."""
+        video_path = self.get_video_path(key)
+        stats_path = self.get_stats_path(key)
+        if not (os.path.exists(video_path) and os.path.exists(stats_path)):
+            return None
+
+        self.touch(key)
+        with open(stats_path) as f:
+            return json.load(f)
+
+    def touch(self, key):
+        """Marks a result as used, e.g. when its page is viewed or its video is served."""
+        video_path = self.get_video_path(key)
+        if os.path.exists(video_path):
+            os.utime(video_path)
+
+    def get_stats(self, key):
+        stats_path = self.get_stats_path(key)
+        if not os.path.exists(stats_path):
+            return None
+        with open(stats_path) as f:
+            return json.load(f)
+
+    def store(self, key, video_path, stats, upload_path=None):
+        """Moves a rendered MP4 into the cache with its stats, then enforces the quota."""
+        with open(self.get_stats_path(key), 'w') as f:
+            json.dump(stats, f)
+        if os.path.abspath(video_path) != os.path.abspath(self.get_video_path(key)):
+            shutil.move(video_path, self.get_video_path(key))
+        os.utime(self.get_video_path(key))
+
+        self.evict(keep_paths=[self.get_video_path(key), upload_path])
+
+    def _get_entries(self):
+        """(last use, paths) of every result and every upload with its pipeline cache."""
+        entries = []
+        for filename in os.listdir(self.cache_folder):
+            key, extension = os.path.splitext(filename)
+            if extension != '.mp4':
+                continue
+            video_path = self.get_video_path(key)
+            entries.append((os.path.getmtime(video_path), [video_path, self.get_stats_path(key)]))
+
+        if self.upload_folder is not None:
+            for filename in os.listdir(self.upload_folder):
+                upload_path = os.path.join(self.upload_folder, filename)
+                # Only stored uploads, not ones still being written or other videos in the folder
+                if not _UPLOAD_FILE_PATTERN.match(filename) or not os.path.isfile(upload_path):
+                    continue
+                paths = [upload_path]
+                if self.pipeline_cache_folder is not None:
+                    paths.append(self.get_pipeline_cache_dir(os.path.splitext(filename)[0]))
+                entries.append((os.path.getmtime(upload_path), paths))
+
+        if self.pipeline_cache_folder is not None and os.path.isdir(self.pipeline_cache_folder):
+            uploads_with_cache = {os.path.abspath(path) for _, paths in entries for path in paths}
+            for filename in os.listdir(self.pipeline_cache_folder):
+                cache_dir = os.path.join(self.pipeline_cache_folder, filename)
+                # Caches left behind by uploads that are gone, e.g. deleted by hand
+                if _UPLOAD_FILE_PATTERN.match(filename) and os.path.abspath(cache_dir) not in uploads_with_cache:
+                    entries.append((os.path.getmtime(cache_dir), [cache_dir]))
+        return entries
+
+    def evict(self, keep_paths=()):
+        """
+        Deletes least recently used results and uploads until they fit in ``max_bytes``.
+        ``keep_paths`` (e.g. the result just stored and its upload) are never deleted.
+        """
+        keep_paths = {os.path.abspath(path) for path in keep_paths if path is not None}
+        entries = []
+        total_bytes = 0
+        for last_used, paths in self._get_entries():
+            size = sum(_get_size(path) for path in paths)
+            entries.append((last_used, paths, size))
+            total_bytes += size
+
+        for _, paths, size in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if os.path.abspath(paths[0]) in keep_paths:
+                continue
+            for path in paths:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.exists(path):
+                    os.remove(path)
+            total_bytes -= size
@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Import sets of the different entry points, the analytics-only path re-renders from
+# cached detections and must not need any of the model dependencies.
+IMPORT_TARGETS = {
+    'bbox_utils': ['utils.bbox_utils'],
+    'utils': ['utils'],
+    'analytics-only': ['constants', 'utils', 'trackers', 'mini_court'],
+    'court_line_detector': ['court_line_detector'],
+    'main': ['main'],
+}
+HEAVY_MODULES = ['cv2', 'numpy', 'pandas', 'torch', 'torchvision', 'ultralytics', 'moviepy', 'onnxruntime']
+
+MEASURE_SCRIPT = """
+import json, sys, time
+start_time = time.perf_counter()
+for module_name in {modules!r}:
+    __import__(module_name)
+elapsed = time.perf_counter() - start_time
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure_cold_import(modules, repeat):
+    """Imports ``modules`` in fresh interpreters and returns the import times and heavy modules loaded."""
+    script = MEASURE_SCRIPT.format(modules=modules, heavy=HEAVY_MODULES)
+    project_root = os.path.dirname(os.path.abspath(__file__))
+
+    timings = []
+    loaded_modules = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script], cwd=project_root,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result['seconds'])
+        loaded_modules = result['loaded']
+    return timings, loaded_modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the project entry points.")
+    parser.add_argument('targets', nargs='*', help=f"Any of {', '.join(IMPORT_TARGETS)}, defaults to all")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    unknown_targets = [target for target in args.targets if target not in IMPORT_TARGETS]
+    if unknown_targets:
+        parser.error(f"unknown targets: {', '.join(unknown_targets)}")
+
+    for target in args.targets or IMPORT_TARGETS:
+        try:
+            timings, loaded_modules = measure_cold_import(IMPORT_TARGETS[target], args.repeat)
+        except subprocess.CalledProcessError as e:
+            print(f"{target:20s} failed: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        print(f"{target:20s} median {statistics.median(timings) * 1000:8.1f} ms  "
+              f"min {min(timings) * 1000:8.1f} ms  loaded: {', '.join(loaded_modules) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+from .match_index import MatchIndex, get_video_match_id, get_shot_events
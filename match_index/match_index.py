@@ -0,0 +1,210 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the tables change, older indexes are rebuilt from scratch
+SCHEMA_VERSION = 2
+
+# player_id/opponent_id identify the players across matches (a name or an id of your own),
+# player_slot is the 1/2 numbering of the players within one analyzed video
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    match_id TEXT PRIMARY KEY,
+    video_path TEXT NOT NULL,
+    match_date REAL NOT NULL,
+    processed_at REAL NOT NULL,
+    fps REAL NOT NULL,
+    num_frames INTEGER NOT NULL,
+    player_1_id TEXT NOT NULL,
+    player_2_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shots (
+    match_id TEXT NOT NULL REFERENCES matches(match_id) ON DELETE CASCADE,
+    shot_index INTEGER NOT NULL,
+    frame_num INTEGER NOT NULL,
+    time_seconds REAL NOT NULL,
+    match_date REAL NOT NULL,
+    player_slot INTEGER NOT NULL,
+    player_id TEXT NOT NULL,
+    shot_speed REAL NOT NULL,
+    opponent_id TEXT NOT NULL,
+    opponent_speed REAL NOT NULL,
+    PRIMARY KEY (match_id, shot_index)
+);
+CREATE INDEX IF NOT EXISTS shots_by_speed ON shots (shot_speed DESC);
+CREATE INDEX IF NOT EXISTS shots_by_player_speed ON shots (player_id, shot_speed DESC);
+CREATE INDEX IF NOT EXISTS shots_by_date ON shots (match_date);
+CREATE INDEX IF NOT EXISTS matches_by_date ON matches (match_date);
+"""
+
+
+def get_video_match_id(video_path, chunk_size=1024 * 1024):
+    """Identifies a match by the SHA-256 of its video, so reprocessing replaces its rows."""
+    content_hash = hashlib.sha256()
+    with open(video_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def get_shot_events(player_stats_data, fps=24):
+    """
+    Turns the cumulative player stats rows built in ``main.py`` into one event per shot.
+
+    Every row after the first is appended for a shot, the player whose shot count
+    went up hit it and the other player's last speed is the opponent speed. Players
+    are the 1/2 slots of the video, ``MatchIndex.add_match`` maps them to identities.
+    """
+    shot_events = []
+    for previous_stats, current_stats in zip(player_stats_data, player_stats_data[1:]):
+        player_slot = 1 if current_stats['player_1_number_of_shots'] > previous_stats['player_1_number_of_shots'] else 2
+        opponent_slot = 1 if player_slot == 2 else 2
+        shot_events.append({
+            'frame_num': int(current_stats['frame_num']),
+            'time_seconds': current_stats['frame_num'] / fps,
+            'player_slot': player_slot,
+            'shot_speed': float(current_stats[f'player_{player_slot}_last_shot_speed']),
+            'opponent_slot': opponent_slot,
+            'opponent_speed': float(current_stats[f'player_{opponent_slot}_last_player_speed']),
+        })
+    return shot_events
+
+
+class MatchIndex:
+    """
+    SQLite index of the shots of every processed match.
+
+    The pipeline adds each match once it is processed; queries run against indexed
+    columns so they stay fast across thousands of matches.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        db_folder = os.path.dirname(db_path)
+        if db_folder:
+            os.makedirs(db_folder, exist_ok=True)
+
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        has_tables = self.connection.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'matches'").fetchone()[0]
+        if has_tables and version < SCHEMA_VERSION:
+            # Older indexes only know the 1/2 slots of each video, reprocess the matches to index them again
+            logger.warning(f"Rebuilding {self.db_path}, it was written by an older version without player identities")
+            with self.connection:
+                self.connection.execute("DROP TABLE IF EXISTS shots")
+                self.connection.execute("DROP TABLE IF EXISTS matches")
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_match(self, match_id, video_path, shot_events, num_frames, player_ids, match_date, fps=24):
+        """
+        Adds a match or replaces it when it was indexed before.
+
+        Args:
+            match_id (str): Stable id of the match, e.g. ``get_video_match_id(video_path)``.
+            video_path (str): Path of the source video.
+            shot_events (list): Events from ``get_shot_events``.
+            num_frames (int): Number of frames of the video.
+            player_ids (tuple): (identity of player 1, identity of player 2), e.g. their names,
+                in the order the rendered video labels them.
+            match_date (float): Unix timestamp of the match, from the match metadata.
+            fps (float): Frame rate used for the shot times.
+        """
+        if match_date is None:
+            raise ValueError("match_date is required, the video's file time is not the date of the match")
+        if player_ids is None or len(player_ids) != 2:
+            raise ValueError("player_ids needs the identities of player 1 and player 2")
+        player_ids = [str(player_id) for player_id in player_ids]
+
+        with self.connection:
+            self.connection.execute("DELETE FROM matches WHERE match_id = ?", (match_id,))
+            self.connection.execute(
+                "INSERT INTO matches (match_id, video_path, match_date, processed_at, fps, num_frames, "
+                "player_1_id, player_2_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (match_id, video_path, match_date, time.time(), fps, num_frames, player_ids[0], player_ids[1]))
+            self.connection.executemany(
+                "INSERT INTO shots (match_id, shot_index, frame_num, time_seconds, match_date, player_slot, "
+                "player_id, shot_speed, opponent_id, opponent_speed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(match_id, shot_index, event['frame_num'], event['time_seconds'], match_date, event['player_slot'],
+                  player_ids[event['player_slot'] - 1], event['shot_speed'], player_ids[event['opponent_slot'] - 1],
+                  event['opponent_speed'])
+                 for shot_index, event in enumerate(shot_events)])
+
+    def _date_filters(self, since, until, column='shots.match_date'):
+        conditions = []
+        parameters = []
+        if since is not None:
+            conditions.append(f"{column} >= ?")
+            parameters.append(since)
+        if until is not None:
+            conditions.append(f"{column} < ?")
+            parameters.append(until)
+        return conditions, parameters
+
+    def fastest_shots(self, player_id=None, since=None, until=None, limit=10):
+        """Fastest shots, optionally of one player (identity) and between two match dates (unix timestamps)."""
+        conditions, parameters = self._date_filters(since, until)
+        if player_id is not None:
+            conditions.append("shots.player_id = ?")
+            parameters.append(str(player_id))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        rows = self.connection.execute(
+            "SELECT shots.*, matches.video_path FROM shots JOIN matches USING (match_id) "
+            f"{where} ORDER BY shots.shot_speed DESC LIMIT ?",
+            parameters + [limit])
+        return [dict(row) for row in rows]
+
+    def player_summary(self, since=None, until=None):
+        """Shot count, average/maximum shot speed and average speed of every player, by identity."""
+        conditions, parameters = self._date_filters(since, until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        shot_rows = self.connection.execute(
+            "SELECT player_id, COUNT(*) AS number_of_shots, AVG(shot_speed) AS average_shot_speed, "
+            f"MAX(shot_speed) AS max_shot_speed FROM shots {where} GROUP BY player_id",
+            parameters)
+        summary = {row['player_id']: dict(row) for row in shot_rows}
+
+        speed_rows = self.connection.execute(
+            "SELECT opponent_id, AVG(opponent_speed) AS average_player_speed, MAX(opponent_speed) AS max_player_speed "
+            f"FROM shots {where} GROUP BY opponent_id",
+            parameters)
+        for row in speed_rows:
+            player_summary = summary.setdefault(row['opponent_id'], {'player_id': row['opponent_id'], 'number_of_shots': 0})
+            player_summary['average_player_speed'] = row['average_player_speed']
+            player_summary['max_player_speed'] = row['max_player_speed']
+
+        return [summary[player_id] for player_id in sorted(summary)]
+
+    def matches(self, since=None, until=None, limit=100):
+        """Indexed matches, most recent first."""
+        conditions, parameters = self._date_filters(since, until, column='matches.match_date')
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        rows = self.connection.execute(
+            "SELECT matches.*, COUNT(shots.shot_index) AS number_of_shots FROM matches "
+            f"LEFT JOIN shots USING (match_id) {where} GROUP BY matches.match_id "
+            "ORDER BY matches.match_date DESC LIMIT ?",
+            parameters + [limit])
+        return [dict(row) for row in rows]
@@ -7,12 +7,15 @@ import constants
 from utils import (
     convert_meters_to_pixel_distance,
     convert_pixel_distance_to_meters,
-    get_foot_position,
-    get_closest_keypoint_index,
-    get_height_of_bbox,
     measure_xy_distance,
-    get_center_of_bbox,
-    measure_distance
+    as_keypoint_matrix,
+    get_centers_of_bboxes,
+    get_foot_positions,
+    get_heights_of_bboxes,
+    get_closest_keypoint_indices,
+    get_windowed_max,
+    measure_distances,
+    measure_xy_distances
 )
 
 class MiniCourt():
@@ -187,9 +190,23 @@ class MiniCourt():
 
         return  mini_court_player_position
 
+    def get_mini_court_coordinates_batch(self, object_positions, closest_key_points, closest_key_point_indices,
+                                         player_heights_in_pixels, player_height_in_meters):
+        """``get_mini_court_coordinates`` for (N, 2) positions and keypoints and (N,) indices and heights."""
+        distances_from_keypoints_pixels = measure_xy_distances(object_positions, closest_key_points)
+        distances_from_keypoints_meters = convert_pixel_distance_to_meters(distances_from_keypoints_pixels,
+                                                                           player_height_in_meters,
+                                                                           np.asarray(player_heights_in_pixels)[:, None])
+        mini_court_distances_pixels = self.convert_meters_to_pixels(distances_from_keypoints_meters)
+        mini_court_key_points = as_keypoint_matrix(self.drawing_key_points)
+        return mini_court_key_points[closest_key_point_indices] + mini_court_distances_pixels
+
     def convert_bounding_boxes_to_mini_court_coordinates(self, player_boxes, ball_boxes, original_court_key_points, default_player_height=1.8):
         """
         Converts player and ball bounding box coordinates to mini-court coordinates.
+
+        All player boxes of the video are converted at once with the batch geometry
+        helpers, the results match the per-box helpers.
         
         Args:
             player_boxes (list): List of player bounding boxes per frame.
@@ -200,62 +217,64 @@ class MiniCourt():
         Returns:
             tuple: (output_player_boxes, output_ball_boxes) with mini-court coordinates.
         """
-        
-        output_player_boxes = []
-        output_ball_boxes = []
+        if len(player_boxes) == 0:
+            return [], []
 
-        for frame_num, player_bbox in enumerate(player_boxes):
-            ball_box = ball_boxes[frame_num][1]
-            ball_position = get_center_of_bbox(ball_box)
-
-            # Find the player closest to the ball in this frame
-            closest_player_id_to_ball = min(player_bbox.keys(), key=lambda x: measure_distance(ball_position, get_center_of_bbox(player_bbox[x])))
+        court_key_points = as_keypoint_matrix(original_court_key_points)
+        reference_key_point_indices = [0, 2, 12, 13]
 
-            output_player_bboxes_dict = {}
+        # One row per (frame, player)
+        row_frame_nums = []
+        row_player_ids = []
+        row_bboxes = []
+        for frame_num, player_bbox in enumerate(player_boxes):
+            if len(player_bbox) == 0:
+                raise ValueError(f"No players detected in frame {frame_num}")
             for player_id, bbox in player_bbox.items():
-                foot_position = get_foot_position(bbox)
-
-                # Get the closest keypoint in pixels
-                closest_key_point_index = get_closest_keypoint_index(foot_position, original_court_key_points, [0, 2, 12, 13])
-                closest_key_point = (original_court_key_points[closest_key_point_index * 2],
-                                    original_court_key_points[closest_key_point_index * 2 + 1])
-
-                # Calculate player height in pixels across multiple frames for averaging
-                frame_index_min = max(0, frame_num - 20)
-                frame_index_max = min(len(player_boxes), frame_num + 50)
-                bboxes_heights_in_pixels = [
-                    get_height_of_bbox(player_boxes[i][player_id])
-                    for i in range(frame_index_min, frame_index_max) if player_id in player_boxes[i]
-                ]
-                max_player_height_in_pixels = max(bboxes_heights_in_pixels) if bboxes_heights_in_pixels else 1  # Avoid division by zero
-
-                mini_court_player_position = self.get_mini_court_coordinates(
-                    foot_position,
-                    closest_key_point,
-                    closest_key_point_index,
-                    max_player_height_in_pixels,
-                    default_player_height  # Use default height for all players
-                )
-
-                output_player_bboxes_dict[player_id] = mini_court_player_position
-
-                # If this player is the closest to the ball, calculate ball position for this player
-                if closest_player_id_to_ball == player_id:
-                    # Get the closest keypoint in pixels for the ball
-                    closest_key_point_index = get_closest_keypoint_index(ball_position, original_court_key_points, [0, 2, 12, 13])
-                    closest_key_point = (original_court_key_points[closest_key_point_index * 2],
-                                        original_court_key_points[closest_key_point_index * 2 + 1])
-
-                    mini_court_ball_position = self.get_mini_court_coordinates(
-                        ball_position,
-                        closest_key_point,
-                        closest_key_point_index,
-                        max_player_height_in_pixels,
-                        default_player_height  # Use default height for ball proximity as well
-                    )
-                    output_ball_boxes.append({1: mini_court_ball_position})
-
-            output_player_boxes.append(output_player_bboxes_dict)
+                row_frame_nums.append(frame_num)
+                row_player_ids.append(player_id)
+                row_bboxes.append(bbox)
+        row_frame_nums = np.asarray(row_frame_nums, dtype=int)
+        row_bboxes = np.asarray(row_bboxes, dtype=float).reshape(-1, 4)
+
+        # Tallest box of each player from 20 frames before to 50 frames after, for the pixels to meters scale
+        row_player_heights = np.empty(len(row_bboxes))
+        row_heights = get_heights_of_bboxes(row_bboxes)
+        for player_id in set(row_player_ids):
+            player_rows = np.asarray([row_player_id == player_id for row_player_id in row_player_ids])
+            heights = np.full(len(player_boxes), np.nan)
+            heights[row_frame_nums[player_rows]] = row_heights[player_rows]
+            max_heights = get_windowed_max(heights, 20, 50)
+            row_player_heights[player_rows] = max_heights[row_frame_nums[player_rows]]
+        row_player_heights[np.isnan(row_player_heights)] = 1  # Avoid division by zero
+
+        foot_positions = get_foot_positions(row_bboxes)
+        closest_key_point_indices = get_closest_keypoint_indices(foot_positions, court_key_points, reference_key_point_indices)
+        mini_court_player_positions = self.get_mini_court_coordinates_batch(foot_positions,
+                                                                            court_key_points[closest_key_point_indices],
+                                                                            closest_key_point_indices,
+                                                                            row_player_heights,
+                                                                            default_player_height)
+
+        # The ball is placed using the scale of the player closest to it in each frame
+        ball_positions = get_centers_of_bboxes([ball_boxes[frame_num][1] for frame_num in range(len(player_boxes))])
+        ball_distances = measure_distances(get_centers_of_bboxes(row_bboxes), ball_positions[row_frame_nums])
+        frame_starts = np.flatnonzero(np.r_[True, row_frame_nums[1:] != row_frame_nums[:-1]])
+        frame_ends = np.r_[frame_starts[1:], len(row_frame_nums)]
+        closest_rows = np.asarray([start + np.argmin(ball_distances[start:end]) for start, end in zip(frame_starts, frame_ends)],
+                                  dtype=int)
+
+        ball_key_point_indices = get_closest_keypoint_indices(ball_positions, court_key_points, reference_key_point_indices)
+        mini_court_ball_positions = self.get_mini_court_coordinates_batch(ball_positions,
+                                                                          court_key_points[ball_key_point_indices],
+                                                                          ball_key_point_indices,
+                                                                          row_player_heights[closest_rows],
+                                                                          default_player_height)
+
+        output_player_boxes = [{} for _ in player_boxes]
+        for frame_num, player_id, position in zip(row_frame_nums.tolist(), row_player_ids, mini_court_player_positions.tolist()):
+            output_player_boxes[frame_num][player_id] = tuple(position)
+        output_ball_boxes = [{1: tuple(position)} for position in mini_court_ball_positions.tolist()]
 
         return output_player_boxes, output_ball_boxes
 
@@ -0,0 +1,10 @@
+from .model_export import (get_optimized_model_path,
+                           find_optimized_model,
+                           resolve_model_path,
+                           artifact_supports_input_size,
+                           get_yolo_input_size,
+                           YOLO_DEFAULT_IMAGE_SIZE,
+                           export_yolo_model,
+                           export_court_model,
+                           OnnxModel)
+from .model_comparison import measure_latency, compare_court_models, compare_yolo_models
@@ -0,0 +1,127 @@
+import time
+import sys
+sys.path.append('../')
+from utils import get_iou, measure_distance
+
+
+def measure_latency(predict, inputs, warmup=2):
+    """
+    Times ``predict`` on every input after a few warmup calls.
+
+    Returns:
+        tuple: (outputs, latencies in milliseconds)
+    """
+    for model_input in inputs[:warmup]:
+        predict(model_input)
+
+    outputs = []
+    latencies = []
+    for model_input in inputs:
+        start_time = time.perf_counter()
+        outputs.append(predict(model_input))
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    return outputs, latencies
+
+
+def summarize_latencies(latencies):
+    latencies = sorted(latencies)
+    return {
+        'mean_ms': sum(latencies) / len(latencies),
+        'p50_ms': latencies[len(latencies) // 2],
+        'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+def compare_court_models(model_path, optimized_model_path, frames):
+    """
+    Compares the eager court keypoints model against an exported artifact on the same frames.
+
+    Returns:
+        dict: Latency summaries of both models, the speedup and the keypoint error in pixels.
+    """
+    from court_line_detector import CourtLineDetector
+
+    eager_detector = CourtLineDetector(model_path, use_optimized=False)
+    optimized_detector = CourtLineDetector(model_path, optimized_model_path=optimized_model_path)
+
+    eager_keypoints, eager_latencies = measure_latency(eager_detector.predict, frames)
+    optimized_keypoints, optimized_latencies = measure_latency(optimized_detector.predict, frames)
+
+    keypoint_errors = []
+    for eager_frame_keypoints, optimized_frame_keypoints in zip(eager_keypoints, optimized_keypoints):
+        for i in range(0, len(eager_frame_keypoints), 2):
+            keypoint_errors.append(measure_distance(eager_frame_keypoints[i:i+2], optimized_frame_keypoints[i:i+2]))
+
+    eager_summary = summarize_latencies(eager_latencies)
+    optimized_summary = summarize_latencies(optimized_latencies)
+    return {
+        'eager': eager_summary,
+        'optimized': optimized_summary,
+        'speedup': eager_summary['mean_ms'] / optimized_summary['mean_ms'],
+        'mean_keypoint_error_px': sum(keypoint_errors) / len(keypoint_errors),
+        'max_keypoint_error_px': max(keypoint_errors),
+    }
+
+
+def match_detections(reference_boxes, boxes, iou_threshold=0.5):
+    """
+    Greedily matches boxes to reference boxes by IoU.
+
+    Returns:
+        list: IoU of every matched reference box.
+    """
+    unmatched_boxes = list(boxes)
+    matched_ious = []
+    for reference_box in reference_boxes:
+        if not unmatched_boxes:
+            break
+        best_box = max(unmatched_boxes, key=lambda box: get_iou(reference_box, box))
+        best_iou = get_iou(reference_box, best_box)
+        if best_iou >= iou_threshold:
+            matched_ious.append(best_iou)
+            unmatched_boxes.remove(best_box)
+    return matched_ious
+
+
+def summarize_detection_agreement(reference_detections, detections, iou_threshold=0.5):
+    """Recall of the reference boxes and the mean IoU of the matched ones."""
+    total_reference_boxes = 0
+    matched_ious = []
+    for reference_boxes, boxes in zip(reference_detections, detections):
+        total_reference_boxes += len(reference_boxes)
+        matched_ious.extend(match_detections(reference_boxes, boxes, iou_threshold))
+
+    return {
+        'recall': len(matched_ious) / total_reference_boxes if total_reference_boxes else 1.0,
+        'mean_iou': sum(matched_ious) / len(matched_ious) if matched_ious else 0.0,
+    }
+
+
+def compare_yolo_models(model_path, optimized_model_path, frames, conf=0.15):
+    """
+    Compares an eager YOLO model against an exported artifact on the same frames.
+
+    Returns:
+        dict: Latency summaries of both models, the speedup and how many of the eager
+        detections the optimized model reproduces.
+    """
+    from ultralytics import YOLO
+
+    eager_model = YOLO(model_path)
+    optimized_model = YOLO(optimized_model_path, task='detect')
+
+    def predict_boxes(model):
+        return lambda frame: [box.xyxy.tolist()[0] for box in model.predict(frame, conf=conf, verbose=False)[0].boxes]
+
+    eager_boxes, eager_latencies = measure_latency(predict_boxes(eager_model), frames)
+    optimized_boxes, optimized_latencies = measure_latency(predict_boxes(optimized_model), frames)
+
+    eager_summary = summarize_latencies(eager_latencies)
+    optimized_summary = summarize_latencies(optimized_latencies)
+    comparison = {
+        'eager': eager_summary,
+        'optimized': optimized_summary,
+        'speedup': eager_summary['mean_ms'] / optimized_summary['mean_ms'],
+    }
+    comparison.update(summarize_detection_agreement(eager_boxes, optimized_boxes))
+    return comparison
@@ -0,0 +1,273 @@
+import json
+import logging
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+MODEL_FORMATS = {
+    'torchscript': '.torchscript',
+    'onnx': '.onnx',
+}
+QUANTIZATION_MODES = (None, 'dynamic', 'static')
+
+# ultralytics' export and inference size when no imgsz is given
+YOLO_DEFAULT_IMAGE_SIZE = 640
+
+# Order in which optimized artifacts are picked up at startup
+OPTIMIZED_MODEL_PREFERENCE = [
+    ('onnx', 'int8'),
+    ('onnx', None),
+    ('torchscript', 'int8'),
+    ('torchscript', None),
+]
+
+
+def get_optimized_model_path(model_path, model_format, quantized=False):
+    """
+    Returns where the optimized artifact of a model lives, next to the original weights.
+
+    e.g. ``models/keypoints_model.pth`` -> ``models/keypoints_model_int8.onnx``
+    """
+    if model_format not in MODEL_FORMATS:
+        raise ValueError(f"Unsupported model format: {model_format}")
+
+    base_path = os.path.splitext(model_path)[0]
+    suffix = '_int8' if quantized else ''
+    return f"{base_path}{suffix}{MODEL_FORMATS[model_format]}"
+
+
+def is_stale_artifact(optimized_path, model_path):
+    """Whether the weights changed after the artifact was exported from them."""
+    if not os.path.exists(model_path):
+        # Weights given by name (e.g. 'yolov8x'), nothing to compare with
+        return False
+    return os.path.getmtime(optimized_path) < os.path.getmtime(model_path)
+
+
+def get_artifact_info_path(optimized_path):
+    return optimized_path + '.json'
+
+
+def write_artifact_info(optimized_path, input_size, dynamic_input):
+    """Records the input size an artifact was exported for, next to it."""
+    with open(get_artifact_info_path(optimized_path), 'w') as f:
+        json.dump({'input_size': input_size, 'dynamic_input': dynamic_input}, f)
+
+
+def artifact_supports_input_size(optimized_path, input_size):
+    """
+    Whether an artifact can run at ``input_size`` (square side in pixels). ``None``
+    means the size varies from frame to frame, which needs dynamic height and width.
+    """
+    info_path = get_artifact_info_path(optimized_path)
+    if not os.path.exists(info_path):
+        # Exported before the input size was recorded, it could be fixed to any size
+        return False
+    with open(info_path) as f:
+        info = json.load(f)
+    return info['dynamic_input'] or (input_size is not None and info['input_size'] == input_size)
+
+
+def find_optimized_model(model_path, input_size=None):
+    """
+    Returns the path of the preferred optimized artifact that exists, is up to date and
+    runs at ``input_size`` (see ``artifact_supports_input_size``), or None.
+    """
+    for model_format, precision in OPTIMIZED_MODEL_PREFERENCE:
+        optimized_path = get_optimized_model_path(model_path, model_format, quantized=precision == 'int8')
+        if not os.path.exists(optimized_path):
+            continue
+        if is_stale_artifact(optimized_path, model_path):
+            logger.warning(f"Ignoring {optimized_path}, it is older than {model_path}; export it again")
+            continue
+        if not artifact_supports_input_size(optimized_path, input_size):
+            logger.warning(f"Ignoring {optimized_path}, it was not exported for input size {input_size}")
+            continue
+        return optimized_path
+    return None
+
+
+def get_yolo_input_size(inference_width):
+    """Input size a YOLO model runs at, None when it follows the frames (a reduced inference width)."""
+    return YOLO_DEFAULT_IMAGE_SIZE if inference_width is None else None
+
+
+def resolve_model_path(model_path, use_optimized=False, input_size=None):
+    """Returns the optimized artifact of a model when asked for and there is one, else the model itself."""
+    if use_optimized:
+        optimized_path = find_optimized_model(model_path, input_size)
+        if optimized_path is not None:
+            logger.info(f"Using optimized model {optimized_path} instead of {model_path}")
+            return optimized_path
+    return model_path
+
+
+def _check_export_options(model_format, quantization):
+    if model_format not in MODEL_FORMATS:
+        raise ValueError(f"Unsupported model format: {model_format}")
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unsupported quantization mode: {quantization}")
+
+
+def _quantize_onnx_dynamic(fp32_path, int8_path):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QUInt8)
+
+
+def _copy_onnx_metadata(source_path, target_path):
+    # ultralytics reads class names and strides from the ONNX metadata
+    import onnx
+
+    source_model = onnx.load(source_path)
+    target_model = onnx.load(target_path)
+    del target_model.metadata_props[:]
+    target_model.metadata_props.extend(source_model.metadata_props)
+    onnx.save(target_model, target_path)
+
+
+def export_yolo_model(model_path, model_format='onnx', quantization=None, output_path=None):
+    """
+    Exports a YOLO model (players or ball) with ultralytics.
+
+    Args:
+        model_path (str): Path or name of the YOLO weights, e.g. ``models/last.pt``.
+        model_format (str): ``'onnx'`` or ``'torchscript'``.
+        quantization (str): ``None`` or ``'dynamic'``. Dynamic int8 quantization is
+            only available for ONNX; the detectors are not set up for static calibration.
+        output_path (str): Where to write the artifact, defaults to ``get_optimized_model_path``.
+
+    Returns:
+        str: Path of the exported artifact.
+    """
+    from ultralytics import YOLO
+
+    _check_export_options(model_format, quantization)
+    if quantization == 'static':
+        raise ValueError("Static quantization is only supported for the court keypoints model.")
+    if quantization == 'dynamic' and model_format != 'onnx':
+        raise ValueError("Quantized YOLO models can only be exported to ONNX.")
+
+    if output_path is None:
+        output_path = get_optimized_model_path(model_path, model_format, quantized=quantization is not None)
+
+    # ONNX models take any image size, so they also run at reduced inference widths
+    dynamic_input = model_format == 'onnx'
+    exported_path = YOLO(model_path).export(format=model_format, dynamic=dynamic_input)
+
+    if quantization == 'dynamic':
+        _quantize_onnx_dynamic(exported_path, output_path)
+        _copy_onnx_metadata(exported_path, output_path)
+    elif os.path.abspath(exported_path) != os.path.abspath(output_path):
+        shutil.move(exported_path, output_path)
+
+    write_artifact_info(output_path, YOLO_DEFAULT_IMAGE_SIZE, dynamic_input)
+    if os.path.exists(exported_path) and os.path.abspath(exported_path) != os.path.abspath(output_path):
+        write_artifact_info(exported_path, YOLO_DEFAULT_IMAGE_SIZE, dynamic_input)
+    return output_path
+
+
+def _quantize_court_model_static_fx(model, calibration_tensors, example_input):
+    import torch
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    prepared_model = prepare_fx(model, get_default_qconfig_mapping('x86'), example_inputs=(example_input,))
+    with torch.no_grad():
+        for tensor in calibration_tensors:
+            prepared_model(tensor)
+    return convert_fx(prepared_model)
+
+
+def _quantize_onnx_static(fp32_path, int8_path, input_name, calibration_tensors):
+    from onnxruntime.quantization import CalibrationDataReader, QuantType, quantize_static
+
+    class CourtCalibrationDataReader(CalibrationDataReader):
+        def __init__(self):
+            self.inputs = iter([{input_name: tensor.numpy()} for tensor in calibration_tensors])
+
+        def get_next(self):
+            return next(self.inputs, None)
+
+    quantize_static(fp32_path, int8_path, CourtCalibrationDataReader(),
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+
+def export_court_model(model_path, model_format='torchscript', quantization=None,
+                       calibration_frames=None, output_path=None):
+    """
+    Exports the court keypoints ResNet50 to TorchScript or ONNX.
+
+    Args:
+        model_path (str): Path of the ``keypoints_model.pth`` state dict.
+        model_format (str): ``'torchscript'`` or ``'onnx'``.
+        quantization (str): ``None``, ``'dynamic'`` (int8 weights for the linear head)
+            or ``'static'`` (int8 weights and activations, needs calibration frames).
+        calibration_frames (list): BGR frames from our footage used to calibrate
+            static quantization.
+        output_path (str): Where to write the artifact, defaults to ``get_optimized_model_path``.
+
+    Returns:
+        str: Path of the exported artifact.
+    """
+    import torch
+    from court_line_detector import CourtLineDetector
+
+    _check_export_options(model_format, quantization)
+    if quantization == 'static' and not calibration_frames:
+        raise ValueError("Static quantization needs calibration frames.")
+
+    if output_path is None:
+        output_path = get_optimized_model_path(model_path, model_format, quantized=quantization is not None)
+
+    court_line_detector = CourtLineDetector(model_path, use_optimized=False)
+    model = court_line_detector.model
+    example_input = torch.zeros(1, 3, court_line_detector.input_size, court_line_detector.input_size)
+    calibration_tensors = [court_line_detector.preprocess(frame) for frame in calibration_frames or []]
+
+    if model_format == 'torchscript':
+        if quantization == 'dynamic':
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif quantization == 'static':
+            model = _quantize_court_model_static_fx(model, calibration_tensors, example_input)
+
+        with torch.no_grad():
+            traced_model = torch.jit.trace(model, example_input)
+        torch.jit.save(traced_model, output_path)
+        write_artifact_info(output_path, court_line_detector.input_size, dynamic_input=False)
+        return output_path
+
+    fp32_path = get_optimized_model_path(model_path, 'onnx') if quantization else output_path
+    torch.onnx.export(model, example_input, fp32_path,
+                      input_names=['images'], output_names=['keypoints'],
+                      dynamic_axes={'images': {0: 'batch', 2: 'height', 3: 'width'}, 'keypoints': {0: 'batch'}})
+
+    if quantization == 'dynamic':
+        _quantize_onnx_dynamic(fp32_path, output_path)
+    elif quantization == 'static':
+        _quantize_onnx_static(fp32_path, output_path, 'images', calibration_tensors)
+
+    write_artifact_info(output_path, court_line_detector.input_size, dynamic_input=True)
+    if fp32_path != output_path:
+        write_artifact_info(fp32_path, court_line_detector.input_size, dynamic_input=True)
+    return output_path
+
+
+class OnnxModel:
+    """Runs an exported ONNX model with onnxruntime behind the same call interface as a torch module."""
+
+    def __init__(self, model_path):
+        import onnxruntime
+
+        self.session = onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, image_tensor):
+        import torch
+
+        outputs = self.session.run(None, {self.input_name: image_tensor.numpy()})
+        return torch.from_numpy(outputs[0])
+
+    def eval(self):
+        return self
@@ -0,0 +1,2 @@
+from .stage_graph import Stage, StageGraph, get_file_fingerprint
+from .tennis_pipeline import build_tennis_pipeline, resolve_model_paths, DEFAULT_PIPELINE_CONFIG
@@ -0,0 +1,107 @@
+import os
+import pickle
+import re
+import sys
+sys.path.append('../')
+from utils import write_pickle_atomic
+
+_SEGMENT_FILE_PATTERN = re.compile(r'^(\d+)-(\d+)\.pkl$')
+
+
+class DetectionRangeCache:
+    """
+    Per-frame detections of one video and detector for the frame ranges analyzed so far.
+
+    Every detected range is stored as its own pickle named after the range, so a later
+    range inside an earlier one is sliced out without running the detector. Detectors
+    without state between frames (the ball detector) can also be assembled from
+    several ranges and only the frames no range covers are detected.
+
+    Args:
+        cache_dir (str): Directory of the segments, one per video and detector configuration.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_segments(self):
+        """Stored ``(start_frame, end_frame)`` ranges, end exclusive, sorted by start."""
+        segments = []
+        for filename in os.listdir(self.cache_dir):
+            match = _SEGMENT_FILE_PATTERN.match(filename)
+            if match:
+                segments.append((int(match.group(1)), int(match.group(2))))
+        return sorted(segments)
+
+    def get_segment_path(self, start_frame, end_frame):
+        return os.path.join(self.cache_dir, f"{start_frame:08d}-{end_frame:08d}.pkl")
+
+    def load_segment(self, start_frame, end_frame):
+        with open(self.get_segment_path(start_frame, end_frame), 'rb') as f:
+            return pickle.load(f)
+
+    def store(self, start_frame, end_frame, detections):
+        write_pickle_atomic(self.get_segment_path(start_frame, end_frame), detections)
+
+    def load_covering(self, start_frame, end_frame):
+        """The detections of the range sliced out of a single stored range, or None."""
+        for segment_start, segment_end in self.get_segments():
+            if segment_start <= start_frame and end_frame <= segment_end:
+                detections = self.load_segment(segment_start, segment_end)
+                return detections[start_frame - segment_start:end_frame - segment_start]
+        return None
+
+    def get_missing_ranges(self, start_frame, end_frame):
+        """Parts of the range no stored range covers."""
+        missing_ranges = []
+        position = start_frame
+        for segment_start, segment_end in self.get_segments():
+            if segment_end <= position or segment_start >= end_frame:
+                continue
+            if segment_start > position:
+                missing_ranges.append((position, segment_start))
+            position = max(position, segment_end)
+        if position < end_frame:
+            missing_ranges.append((position, end_frame))
+        return missing_ranges
+
+    def load_assembled(self, start_frame, end_frame):
+        """The detections of the range taken from every stored range that overlaps it."""
+        detections = [None] * (end_frame - start_frame)
+        for segment_start, segment_end in self.get_segments():
+            if segment_end <= start_frame or segment_start >= end_frame:
+                continue
+            segment_detections = self.load_segment(segment_start, segment_end)
+            first = max(start_frame, segment_start)
+            last = min(end_frame, segment_start + len(segment_detections))
+            for frame_num in range(first, last):
+                detections[frame_num - start_frame] = segment_detections[frame_num - segment_start]
+
+        # A stored range can end early at the end of the video, so can the assembled one
+        if None in detections:
+            detections = detections[:detections.index(None)]
+        return detections
+
+
+def detect_range_with_cache(detection_cache, detect_range, start_frame, end_frame, stateless):
+    """
+    Returns the detections of ``[start_frame, end_frame)``, running ``detect_range(start, end)``
+    only for frames the cache cannot provide.
+
+    Stateful detectors (the player tracker keeps track IDs across frames) are only
+    served from a single stored range that covers the whole request, otherwise the
+    range is detected from its start so the IDs stay consistent.
+    """
+    detections = detection_cache.load_covering(start_frame, end_frame)
+    if detections is not None:
+        return detections
+
+    if not stateless:
+        detections = detect_range(start_frame, end_frame)
+        detection_cache.store(start_frame, end_frame, detections)
+        return detections
+
+    for missing_start, missing_end in detection_cache.get_missing_ranges(start_frame, end_frame):
+        detection_cache.store(missing_start, missing_end, detect_range(missing_start, missing_end))
+    return detection_cache.load_assembled(start_frame, end_frame)
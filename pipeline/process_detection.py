@@ -0,0 +1,131 @@
+import gc
+import logging
+import multiprocessing
+import queue
+import sys
+import threading
+import traceback
+sys.path.append('../')
+from utils.shared_frame_buffer import SharedFrameRingBuffer, decode_video_to_ring_buffer, get_video_frame_shape
+
+logger = logging.getLogger(__name__)
+
+
+def _create_detector(detector_type, detector_kwargs):
+    from trackers import PlayerTracker, BallTracker
+
+    detector_classes = {'players': PlayerTracker, 'ball': BallTracker}
+    return detector_classes[detector_type](**detector_kwargs)
+
+
+def _run_detector_process(name, detector_type, detector_kwargs, ring_buffer, result_queue, start_frame, frame_ranges):
+    detector = None
+    frame = None
+    try:
+        detector = _create_detector(detector_type, detector_kwargs)
+        # Frames are read in place from the shared slots, nothing is copied to this process
+        detections = []
+        for sequence, frame in ring_buffer.iter_frames():
+            frame_num = start_frame + sequence
+            if frame_ranges is None or any(range_start <= frame_num < range_end for range_start, range_end in frame_ranges):
+                detections.append(detector.detect_frame(frame))
+            else:
+                detections.append(None)
+        result_queue.put((name, detections, None))
+    except BaseException:
+        ring_buffer.abort()
+        result_queue.put((name, None, traceback.format_exc()))
+    finally:
+        # ultralytics keeps the last frame it saw (orig_img of its results), every view of
+        # the shared slots has to be gone before the shared memory can be closed
+        detector = None
+        frame = None
+        gc.collect()
+        ring_buffer.release()
+
+
+def detect_in_processes(video_path, detectors, num_slots=16, frame_cache_dir=None, start_frame=0, end_frame=None,
+                        frame_ranges=None):
+    """
+    Runs several detectors over one decode of the video, each in its own process.
+
+    The video is decoded once into a shared memory ring buffer that every detector
+    process reads in place, so no frame is pickled or sent through a pipe.
+
+    Args:
+        video_path (str): Video to analyze.
+        detectors (dict): name -> (detector type ('players' or 'ball'), keyword arguments of the tracker).
+        num_slots (int): Frames the decoder may be ahead of the slowest detector.
+        frame_cache_dir (str): Read the frames from the decoded-frame cache instead of decoding.
+        start_frame (int): First frame to detect on.
+        end_frame (int): Frame to stop before, None runs to the end of the video.
+        frame_ranges (dict): name -> ``(start, end)`` ranges a stateless detector is limited to,
+            detectors not in it detect every frame.
+
+    Returns:
+        dict: name -> list with the detections of every frame of the range, None outside its ranges.
+    """
+    frame_ranges = frame_ranges or {}
+    # Torch and the video decoder keep threads around, forking them is not safe
+    context = multiprocessing.get_context('spawn')
+    ring_buffer = SharedFrameRingBuffer(num_slots, get_video_frame_shape(video_path), len(detectors), context=context)
+    result_queue = context.Queue()
+
+    processes = {}
+    for name, (detector_type, detector_kwargs) in detectors.items():
+        processes[name] = context.Process(target=_run_detector_process, daemon=True,
+                                          args=(name, detector_type, detector_kwargs, ring_buffer, result_queue,
+                                                start_frame, frame_ranges.get(name)))
+    decode_errors = []
+
+    def decode():
+        try:
+            decode_video_to_ring_buffer(video_path, ring_buffer, frame_cache_dir, start_frame, end_frame)
+        except BaseException as e:
+            decode_errors.append(e)
+
+    decoder = threading.Thread(target=decode, daemon=True)
+
+    try:
+        for process in processes.values():
+            process.start()
+        decoder.start()
+
+        # Results are collected before joining, a process does not exit before its queue is drained
+        results = {}
+        errors = []
+        finished = set()
+        while len(finished) < len(processes):
+            try:
+                name, detections, error = result_queue.get(timeout=1.0)
+            except queue.Empty:
+                dead = [name for name, process in processes.items()
+                        if not process.is_alive() and name not in finished]
+                # A process flushes its result before exiting, so check the queue once more
+                if dead and result_queue.empty():
+                    ring_buffer.abort()
+                    raise RuntimeError(f"Detector processes {dead} exited with no result")
+                continue
+            finished.add(name)
+            if error is not None:
+                errors.append(f"{name}:\n{error}")
+            else:
+                results[name] = detections
+
+        decoder.join()
+        if decode_errors:
+            raise decode_errors[0]
+        if errors:
+            raise RuntimeError("Detector processes failed\n" + "\n".join(errors))
+        return results
+    finally:
+        ring_buffer.abort()
+        if decoder.is_alive():
+            decoder.join(timeout=5.0)
+        for process in processes.values():
+            if process.pid is None:
+                continue
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        ring_buffer.release()
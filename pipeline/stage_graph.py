@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+sys.path.append('../')
+from utils import write_pickle_atomic
+
+
+def get_file_fingerprint(path):
+    """Identifies a file version by its path, size and modification time without reading it."""
+    if not os.path.exists(path):
+        return f"{path}:missing"
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class Stage:
+    """
+    A named step of the pipeline.
+
+    Args:
+        name (str): Unique stage name, also used for the cache file names.
+        function (callable): Called with the inputs and the config as keyword arguments.
+            Returns the single output, or a tuple with one value per output.
+        inputs (list): Names of the outputs of other stages (or sources) it needs.
+        outputs (list): Names of the values it produces.
+        config (dict): Keyword arguments that change the result, part of the cache key.
+        options (dict): Keyword arguments that do not change the result, such as queue
+            sizes or thread counts, left out of the cache key.
+        watch_files (list): Files such as model weights whose changes invalidate the stage.
+        persist (bool): Whether to keep the outputs on disk between runs. Stages that are
+            cheap to redo or produce huge values (decoded frames) are not persisted.
+        version (int): Bump when the stage's code changes its result.
+    """
+
+    def __init__(self, name, function, inputs=(), outputs=(), config=None, options=None, watch_files=(),
+                 persist=True, version=1):
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.outputs = list(outputs) or [name]
+        self.config = dict(config or {})
+        self.options = dict(options or {})
+        self.watch_files = list(watch_files)
+        self.persist = persist
+        self.version = version
+
+
+class StageGraph:
+    """
+    Runs stages on demand and memoizes their outputs.
+
+    The cache key of a stage is derived from its name, version, config and watched
+    files and from the keys of the stages it depends on, so keys are known without
+    running anything. Asking for an output loads it from the cache when its key is
+    unchanged and otherwise runs just the stages that are needed to recompute it.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.stages = {}
+        self.producers = {}
+        self.sources = {}
+        self.source_keys = {}
+        self.values = {}
+        self.stage_keys = {}
+        # (stage name, 'ran' or 'loaded') in the order it happened, for reporting
+        self.history = []
+
+    def add_source(self, name, value, key):
+        """Adds an input given from outside the graph, ``key`` identifies its content."""
+        self.sources[name] = value
+        self.source_keys[name] = str(key)
+        self.values[name] = value
+
+    def add_stage(self, stage):
+        if stage.name in self.stages:
+            raise ValueError(f"Duplicate stage name: {stage.name}")
+        for output in stage.outputs:
+            if output in self.producers or output in self.sources:
+                raise ValueError(f"Output '{output}' of stage '{stage.name}' is already produced elsewhere")
+            self.producers[output] = stage
+        self.stages[stage.name] = stage
+        return stage
+
+    def get_stage_key(self, stage, visiting=()):
+        if stage.name in self.stage_keys:
+            return self.stage_keys[stage.name]
+        if stage.name in visiting:
+            raise ValueError(f"Stage '{stage.name}' depends on itself")
+
+        input_keys = {}
+        for input_name in stage.inputs:
+            if input_name in self.source_keys:
+                input_keys[input_name] = self.source_keys[input_name]
+            elif input_name in self.producers:
+                producer = self.producers[input_name]
+                input_keys[input_name] = f"{self.get_stage_key(producer, visiting + (stage.name,))}/{input_name}"
+            else:
+                raise KeyError(f"No stage or source produces '{input_name}', needed by stage '{stage.name}'")
+
+        key_data = {
+            'name': stage.name,
+            'version': stage.version,
+            'config': stage.config,
+            'watch_files': [get_file_fingerprint(path) for path in stage.watch_files],
+            'inputs': input_keys,
+        }
+        key = hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode()).hexdigest()
+        self.stage_keys[stage.name] = key
+        return key
+
+    def get_cache_path(self, stage):
+        return os.path.join(self.cache_dir, f"{stage.name}-{self.get_stage_key(stage)[:20]}.pkl")
+
+    def get(self, name):
+        """Returns an output, loading it from the cache or running the stages it needs."""
+        if name in self.values:
+            return self.values[name]
+        if name not in self.producers:
+            raise KeyError(f"No stage or source produces '{name}'")
+
+        self._run_stage(self.producers[name])
+        return self.values[name]
+
+    def get_many(self, *names):
+        return tuple(self.get(name) for name in names)
+
+    def is_cached(self, name):
+        """Whether an output is available without running its stage."""
+        if name in self.values:
+            return True
+        stage = self.producers[name]
+        return stage.persist and os.path.exists(self.get_cache_path(stage))
+
+    def _run_stage(self, stage):
+        cache_path = self.get_cache_path(stage)
+        if stage.persist and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    outputs = pickle.load(f)
+                self._store_outputs(stage, outputs)
+                self.history.append((stage.name, 'loaded'))
+                return
+            except Exception:
+                logging.error(f"Discarding unreadable cache of stage '{stage.name}'", exc_info=True)
+
+        inputs = {input_name: self.get(input_name) for input_name in stage.inputs}
+        try:
+            result = stage.function(**inputs, **stage.config, **stage.options)
+        except Exception:
+            logging.error(f"Stage '{stage.name}' failed", exc_info=True)
+            raise
+
+        outputs = result if len(stage.outputs) > 1 else (result,)
+        if len(outputs) != len(stage.outputs):
+            raise ValueError(f"Stage '{stage.name}' returned {len(outputs)} values for outputs {stage.outputs}")
+
+        if stage.persist:
+            write_pickle_atomic(cache_path, tuple(outputs))
+
+        self._store_outputs(stage, outputs)
+        self.history.append((stage.name, 'ran'))
+
+    def _store_outputs(self, stage, outputs):
+        for output_name, value in zip(stage.outputs, outputs):
+            self.values[output_name] = value
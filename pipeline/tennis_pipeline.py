@@ -0,0 +1,492 @@
+import logging
+import os
+import sys
+from datetime import datetime
+sys.path.append('../')
+from utils import (iter_video_frames,
+                   get_frame_range,
+                   VideoFrameWriter,
+                   sample_video_frames,
+                   prune_frame_caches,
+                   InferenceFrame,
+                   draw_player_stats_on_frame,
+                   calculate_player_stats,
+                   build_player_stats_dataframe,
+                   get_analytics_path,
+                   export_match_analytics)
+from trackers import PlayerTracker, BallTracker, CourtRegion
+from court_line_detector import CourtLineDetector
+from mini_court import MiniCourt
+from match_index import MatchIndex, get_video_match_id, get_shot_events
+from model_optimization import resolve_model_path, get_yolo_input_size
+from .stage_graph import Stage, StageGraph, get_file_fingerprint
+from .threaded_pipeline import ThreadedPipeline
+from .process_detection import detect_in_processes
+from .detection_cache import DetectionRangeCache, detect_range_with_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PIPELINE_CONFIG = {
+    'player_model_path': 'yolov8x',
+    'ball_model_path': 'models/last.pt',
+    'court_model_path': 'models/keypoints_model.pth',
+    # Load the ONNX/TorchScript artifacts of export_models.py next to the weights instead
+    # of the weights themselves, artifacts older than the weights are ignored
+    'use_optimized_models': False,
+    # Inference resolution of each model, None keeps the full resolution frames
+    'player_inference_width': None,
+    'ball_inference_width': None,
+    # Detect players only on the court grown by this margin (0.3 = 30%), cropping the
+    # frames and dropping people off the court while tracking. None uses whole frames.
+    'player_court_margin': None,
+    # Frames without a ball detection are filled at most this many frames behind detection
+    # (None fills every gap between its two detections) with 'hold' or 'velocity', see BallInterpolator
+    'ball_max_lag': None,
+    'ball_motion_model': 'hold',
+    'court_input_size': 224,
+    'fps': 24,
+    # Capacity of the queues between the decode/inference/render/encode threads
+    'queue_size': 8,
+    'render_workers': 2,
+    # Level the queue occupancy and busy/wait times of the threaded pipelines are logged at
+    'stats_log_level': logging.INFO,
+    # Run the player and ball detectors in two processes that read one decode of the
+    # video from shared memory, instead of each decoding the video in its own threads
+    'detection_processes': False,
+    'shared_frame_slots': 16,
+    # Decode the video once into a memory-mapped file that every later pass reads,
+    # None decodes the video again in every pass
+    'frame_cache_dir': None,
+    # Least recently used videos are deleted from frame_cache_dir beyond this size
+    'frame_cache_max_bytes': 20 * 1024 ** 3,
+    'match_index_path': None,
+    # Match metadata the index needs: (player 1, player 2) identities as labeled in the
+    # rendered video, e.g. their names, and the ISO date of the match
+    'player_ids': None,
+    'match_date': None,
+    'player_mini_court_color': (0, 255, 0),
+    'ball_mini_court_color': (0, 255, 255),
+}
+
+
+def read_first_frame(video_path, frame_cache_dir):
+    return sample_video_frames(video_path, 1, frame_cache_dir)[0]
+
+
+def is_in_ranges(frame_num, frame_ranges):
+    return any(range_start <= frame_num < range_end for range_start, range_end in frame_ranges)
+
+
+def iter_detections(video_path, detectors, queue_size, frame_cache_dir, start_frame=0, end_frame=None,
+                    stats_log_level=logging.INFO):
+    """
+    Decodes the range once and runs every detector on it, each detector in its own thread.
+
+    Args:
+        detectors (dict): name -> (detector, ``(start, end)`` ranges to detect, None for every frame).
+            Stateful detectors (the player tracker) must detect every frame.
+
+    Yields:
+        dict: name -> detections of the frame, None outside the detector's ranges, in frame order.
+    """
+    # Every downscaled size is prepared once and shared by the detectors that need it. A
+    # detector limited to the court crops before it downscales, so it gets the full frames.
+    downscale_widths = {detector.inference_width for detector, _ in detectors.values()
+                        if getattr(detector, 'court_region', None) is None}
+
+    def downscale(item):
+        frame_num, frame = item
+        inference_frame = InferenceFrame(frame)
+        for inference_width in downscale_widths:
+            inference_frame.at_width(inference_width)
+        return frame_num, inference_frame, {}
+
+    def detect_stage(name, detector, frame_ranges):
+        def detect(item):
+            frame_num, inference_frame, detections = item
+            if frame_ranges is None or is_in_ranges(frame_num, frame_ranges):
+                detections[name] = detector.detect_frame(inference_frame)
+            else:
+                detections[name] = None
+            return item
+        return (f"detect {name}", detect)
+
+    pipeline = ThreadedPipeline([('downscale', downscale)] +
+                                [detect_stage(name, detector, frame_ranges)
+                                 for name, (detector, frame_ranges) in detectors.items()],
+                                queue_size=queue_size)
+    frames = enumerate(iter_video_frames(video_path, frame_cache_dir, start_frame, end_frame), start_frame)
+    for _, _, detections in pipeline.run(frames, source_name='decode'):
+        yield detections
+    logger.log(stats_log_level, f"Detection pipeline ({', '.join(detectors)}):\n{pipeline.format_stats()}")
+
+
+def get_court_region(court_keypoints, court_margin):
+    if court_margin is None:
+        return None
+    return CourtRegion(court_keypoints, margin=court_margin)
+
+
+def detect_with_range_caches(player_cache, ball_cache, frame_range, detect):
+    """
+    Player and ball detections of the range, detecting only what the range caches lack.
+
+    ``detect(start_frame, end_frame, detect_players, ball_ranges)`` decodes ``[start_frame, end_frame)``
+    once and returns (player detections or None, ball detections with None outside ``ball_ranges``).
+    Track IDs carry over between frames, so players are only reused from a stored range
+    covering this one; ball frames are detected on their own and stitched from every stored range.
+    """
+    start_frame, end_frame = frame_range
+    player_detections = player_cache.load_covering(start_frame, end_frame)
+    missing_ball_ranges = ball_cache.get_missing_ranges(start_frame, end_frame)
+
+    if player_detections is None:
+        # One decode for both, the ball is only detected where it is not stored yet
+        player_detections, ball_detections = detect(start_frame, end_frame, True, missing_ball_ranges)
+        player_cache.store(start_frame, end_frame, player_detections)
+        for range_start, range_end in missing_ball_ranges:
+            ball_cache.store(range_start, range_end, ball_detections[range_start - start_frame:range_end - start_frame])
+    else:
+        for range_start, range_end in missing_ball_ranges:
+            _, ball_detections = detect(range_start, range_end, False, [(range_start, range_end)])
+            ball_cache.store(range_start, range_end, ball_detections)
+
+    return player_detections, ball_cache.load_assembled(start_frame, end_frame)
+
+
+def detect_players_and_ball(video_path, frame_range, player_model_path, player_inference_width, ball_model_path,
+                            ball_inference_width, ball_max_lag, ball_motion_model, queue_size, frame_cache_dir,
+                            player_cache_dir, ball_cache_dir, stats_log_level=logging.INFO, court_keypoints=None,
+                            court_margin=None):
+    player_tracker = PlayerTracker(model_path=player_model_path, inference_width=player_inference_width,
+                                   court_region=get_court_region(court_keypoints, court_margin))
+    ball_tracker = BallTracker(model_path=ball_model_path, inference_width=ball_inference_width)
+    streamed_ball_detections = []
+
+    def detect(start_frame, end_frame, detect_players, ball_ranges):
+        detectors = {}
+        if detect_players:
+            detectors['players'] = (player_tracker, None)
+        if ball_ranges:
+            detectors['ball'] = (ball_tracker, ball_ranges)
+        detections = {name: [] for name in detectors}
+
+        def iter_raw_ball_detections():
+            for frame_detections in iter_detections(video_path, detectors, queue_size, frame_cache_dir,
+                                                    start_frame, end_frame, stats_log_level):
+                for name, frame_detection in frame_detections.items():
+                    detections[name].append(frame_detection)
+                yield frame_detections.get('ball')
+
+        if ball_ranges == [tuple(frame_range)]:
+            # Every ball detection of the range comes from this pass, interpolate while it is still detecting
+            streamed_ball_detections.extend(ball_dict for _, ball_dict in BallTracker.stream_ball_positions(
+                iter_raw_ball_detections(), ball_max_lag, ball_motion_model))
+        else:
+            for _ in iter_raw_ball_detections():
+                pass
+        return detections.get('players'), detections.get('ball')
+
+    player_detections, raw_ball_detections = detect_with_range_caches(
+        DetectionRangeCache(player_cache_dir), DetectionRangeCache(ball_cache_dir), frame_range, detect)
+    if streamed_ball_detections:
+        return player_detections, streamed_ball_detections
+    return player_detections, interpolate_ball(raw_ball_detections, ball_max_lag, ball_motion_model)
+
+
+def detect_players_and_ball_in_processes(video_path, frame_range, player_model_path, player_inference_width,
+                                         ball_model_path, ball_inference_width, ball_max_lag, ball_motion_model,
+                                         shared_frame_slots, frame_cache_dir, player_cache_dir, ball_cache_dir,
+                                         court_keypoints=None, court_margin=None):
+    player_detector = ('players', {'model_path': player_model_path,
+                                   'inference_width': player_inference_width,
+                                   'court_region': get_court_region(court_keypoints, court_margin)})
+    ball_detector = ('ball', {'model_path': ball_model_path, 'inference_width': ball_inference_width})
+
+    def detect(start_frame, end_frame, detect_players, ball_ranges):
+        detectors = {}
+        if detect_players:
+            detectors['players'] = player_detector
+        if ball_ranges:
+            detectors['ball'] = ball_detector
+        detections = detect_in_processes(video_path, detectors, num_slots=shared_frame_slots,
+                                         frame_cache_dir=frame_cache_dir, start_frame=start_frame,
+                                         end_frame=end_frame, frame_ranges={'ball': ball_ranges})
+        return detections.get('players'), detections.get('ball')
+
+    player_detections, raw_ball_detections = detect_with_range_caches(
+        DetectionRangeCache(player_cache_dir), DetectionRangeCache(ball_cache_dir), frame_range, detect)
+    return player_detections, interpolate_ball(raw_ball_detections, ball_max_lag, ball_motion_model)
+
+
+def interpolate_ball(raw_ball_detections, max_lag=None, motion_model='hold'):
+    return BallTracker.interpolate_ball_positions(raw_ball_detections, max_lag, motion_model)
+
+
+def detect_court_keypoints(first_frame, model_path, optimized_model_path, input_size):
+    court_line_detector = CourtLineDetector(model_path, optimized_model_path=optimized_model_path, input_size=input_size)
+    return court_line_detector.predict(first_frame)
+
+
+def choose_players(all_player_detections, court_keypoints):
+    return PlayerTracker.choose_and_filter_players(court_keypoints, all_player_detections)
+
+
+def detect_ball_shots(ball_detections):
+    return BallTracker.get_ball_shot_frames(ball_detections)
+
+
+def create_mini_court(first_frame):
+    return MiniCourt(first_frame)
+
+
+def project_to_mini_court(mini_court, player_detections, ball_detections, court_keypoints):
+    return mini_court.convert_bounding_boxes_to_mini_court_coordinates(player_detections, ball_detections, court_keypoints)
+
+
+def calculate_stats(ball_shot_frames, player_mini_court_detections, ball_mini_court_detections, mini_court,
+                    ball_detections, fps):
+    player_stats_data = calculate_player_stats(ball_shot_frames,
+                                               player_mini_court_detections,
+                                               ball_mini_court_detections,
+                                               mini_court.get_width_of_mini_court(),
+                                               fps=fps)
+    player_stats_data_df = build_player_stats_dataframe(player_stats_data, num_frames=len(ball_detections))
+    return player_stats_data, player_stats_data_df
+
+
+def export_analytics(frame_range, player_detections, ball_detections, player_mini_court_detections,
+                     ball_mini_court_detections, ball_shot_frames, player_stats_data_df, analytics_path):
+    return export_match_analytics(analytics_path,
+                                  player_detections,
+                                  ball_detections,
+                                  player_mini_court_detections,
+                                  ball_mini_court_detections,
+                                  ball_shot_frames,
+                                  player_stats_data_df,
+                                  first_frame_num=frame_range[0])
+
+
+def index_match(video_path, player_stats_data, ball_detections, match_index_path, fps, whole_video, player_ids,
+                match_date):
+    # A rally would replace the match's shots with just its own
+    if not whole_video:
+        logger.info(f"Not indexing {video_path}, only part of it was analyzed")
+        return None
+    if player_ids is None or match_date is None:
+        logger.info(f"Not indexing {video_path}, set player_ids and match_date in the pipeline config to index it")
+        return None
+
+    with MatchIndex(match_index_path) as match_index:
+        match_index.add_match(get_video_match_id(video_path),
+                              video_path,
+                              get_shot_events(player_stats_data, fps=fps),
+                              num_frames=len(ball_detections),
+                              player_ids=player_ids,
+                              match_date=datetime.fromisoformat(match_date).timestamp(),
+                              fps=fps)
+    return match_index_path
+
+
+def render_video(video_path, frame_range, player_detections, ball_detections, court_keypoints, mini_court,
+                 player_mini_court_detections, ball_mini_court_detections, player_stats_data_df,
+                 output_video_path, player_mini_court_color, ball_mini_court_color, fps, queue_size, render_workers,
+                 frame_cache_dir, stats_log_level=logging.INFO):
+    import cv2
+
+    start_frame, end_frame = frame_range
+    player_stats_rows = player_stats_data_df.to_dict('records')
+
+    def annotate_frame(item):
+        frame_num, frame = item
+        frame = PlayerTracker.draw_bboxes([frame], [player_detections[frame_num]])[0]
+        frame = BallTracker.draw_bboxes([frame], [ball_detections[frame_num]])[0]
+        frame = CourtLineDetector.draw_keypoints(frame, court_keypoints)
+        frame = mini_court.draw_mini_court([frame])[0]
+        frame = mini_court.draw_points_on_mini_court([frame], [player_mini_court_detections[frame_num]], color=player_mini_court_color)[0]
+        if frame_num < len(ball_mini_court_detections):
+            frame = mini_court.draw_points_on_mini_court([frame], [ball_mini_court_detections[frame_num]], color=ball_mini_court_color)[0]
+        frame = draw_player_stats_on_frame(frame, player_stats_rows[frame_num])
+        cv2.putText(frame, f"Frame: {start_frame + frame_num}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        return frame
+
+    # Drawing a frame only depends on that frame, the encoder gets them back in order
+    writer = VideoFrameWriter(output_video_path, fps=fps)
+    pipeline = ThreadedPipeline([
+        ('annotate', annotate_frame, render_workers),
+        ('encode', writer.write),
+    ], queue_size=queue_size)
+    # The annotators draw on the frames, cached frames are copied one at a time
+    frames = iter_video_frames(video_path, frame_cache_dir, start_frame, end_frame, writable=True)
+    for _ in pipeline.run(enumerate(frames), source_name='decode'):
+        pass
+    writer.release()
+    logger.log(stats_log_level, f"Render pipeline:\n{pipeline.format_stats()}")
+
+    return output_video_path
+
+
+def get_detection_cache_dir(graph, stage):
+    """Stored detection ranges of the detector ``stage`` describes, keyed like it but shared by every frame range."""
+    all_ranges_stage = Stage(f"{stage.name}_all_ranges", stage.function,
+                             inputs=[input_name for input_name in stage.inputs if input_name != 'frame_range'],
+                             outputs=stage.outputs, config=stage.config, watch_files=stage.watch_files,
+                             version=stage.version)
+    return os.path.join(graph.cache_dir, 'detections', f"{stage.name}-{graph.get_stage_key(all_ranges_stage)[:20]}")
+
+
+def resolve_model_paths(config=None):
+    """
+    The model files the pipeline loads with ``config``, the optimized artifacts when they are
+    used. Fingerprint these to key anything that depends on the models.
+
+    Returns:
+        dict: 'player_model_path', 'ball_model_path' and 'court_model_path' -> path.
+    """
+    config = dict(DEFAULT_PIPELINE_CONFIG, **(config or {}))
+    return {
+        'player_model_path': resolve_model_path(config['player_model_path'], config['use_optimized_models'],
+                                                get_yolo_input_size(config['player_inference_width'])),
+        'ball_model_path': resolve_model_path(config['ball_model_path'], config['use_optimized_models'],
+                                              get_yolo_input_size(config['ball_inference_width'])),
+        'court_model_path': resolve_model_path(config['court_model_path'], config['use_optimized_models'],
+                                               config['court_input_size']),
+    }
+
+
+def build_tennis_pipeline(input_video_path, output_video_path, config=None, cache_dir="pipeline_cache",
+                          frame_range=None):
+    """
+    Builds the stage graph of the analysis of one video.
+
+    Detections, court keypoints, projections and stats are cached in ``cache_dir`` and
+    keyed by the video, the models and the configuration, so e.g. a drawing change
+    only decodes, renders and encodes the video again. Ask for ``'output_video_path'``
+    to render, ``'analytics_path'`` to export the per-frame analytics and
+    ``'match_index_path'`` to update the match index.
+
+    ``frame_range`` (see ``utils.get_frame_range``) limits detection, stats and rendering
+    to ``(start_frame, end_frame)``. The court keypoints come from the first frame of the
+    video and detections are stored per range, so ranges overlapping earlier ones reuse them.
+    """
+    config = dict(DEFAULT_PIPELINE_CONFIG, **(config or {}))
+    whole_video_range = get_frame_range(input_video_path)
+    frame_range = tuple(frame_range) if frame_range is not None else whole_video_range
+    # The files actually loaded, the detection stages get them directly
+    model_paths = resolve_model_paths(config)
+    player_model_path = model_paths['player_model_path']
+    ball_model_path = model_paths['ball_model_path']
+    court_model_path = model_paths['court_model_path']
+
+    if config['frame_cache_dir'] is not None:
+        # A partial range only reads an existing cache, no room to make for a new one
+        prune_frame_caches(config['frame_cache_dir'], config['frame_cache_max_bytes'], input_video_path,
+                           create=frame_range == whole_video_range)
+
+    graph = StageGraph(cache_dir)
+    graph.add_source('video_path', input_video_path, key=get_file_fingerprint(input_video_path))
+    graph.add_source('frame_range', frame_range, key=f"{frame_range[0]}-{frame_range[1]}")
+
+    # Frames are streamed from the video (or the decoded-frame cache) by the stages that need
+    # them, never held all in memory
+    graph.add_stage(Stage('read_first_frame', read_first_frame, inputs=['video_path'], outputs=['first_frame'],
+                          options={'frame_cache_dir': config['frame_cache_dir']}, persist=False))
+
+    # Limiting player detection to the court makes it depend on the court keypoints
+    player_inputs = ['video_path', 'frame_range']
+    player_config = {}
+    if config['player_court_margin'] is not None:
+        player_inputs.append('court_keypoints')
+        player_config['court_margin'] = config['player_court_margin']
+
+    # Detections are stored per frame range and detector by the stage itself, see get_detection_cache_dir
+    player_detection_config = dict({'model_path': player_model_path,
+                                    'inference_width': config['player_inference_width']}, **player_config)
+    ball_detection_config = {'model_path': ball_model_path, 'inference_width': config['ball_inference_width']}
+    detection_config = dict({'player_model_path': player_model_path,
+                             'player_inference_width': config['player_inference_width'],
+                             'ball_model_path': ball_model_path,
+                             'ball_inference_width': config['ball_inference_width'],
+                             'ball_max_lag': config['ball_max_lag'],
+                             'ball_motion_model': config['ball_motion_model']},
+                            **player_config)
+    if config['detection_processes']:
+        detection_stage = Stage('detect_players_and_ball', detect_players_and_ball_in_processes,
+                                inputs=player_inputs,
+                                outputs=['all_player_detections', 'ball_detections'],
+                                config=detection_config,
+                                options={'shared_frame_slots': config['shared_frame_slots'],
+                                         'frame_cache_dir': config['frame_cache_dir']},
+                                watch_files=[player_model_path, ball_model_path],
+                                persist=False)
+    else:
+        # One decode feeds both detectors, each in its own thread
+        detection_stage = Stage('detect_players_and_ball', detect_players_and_ball,
+                                inputs=player_inputs,
+                                outputs=['all_player_detections', 'ball_detections'],
+                                config=detection_config,
+                                options={'queue_size': config['queue_size'],
+                                         'frame_cache_dir': config['frame_cache_dir'],
+                                         'stats_log_level': config['stats_log_level']},
+                                watch_files=[player_model_path, ball_model_path],
+                                persist=False)
+    graph.add_stage(detection_stage)
+    graph.add_stage(Stage('detect_court_keypoints', detect_court_keypoints,
+                          inputs=['first_frame'],
+                          outputs=['court_keypoints'],
+                          config={'model_path': config['court_model_path'],
+                                  'optimized_model_path': court_model_path if court_model_path != config['court_model_path'] else None,
+                                  'input_size': config['court_input_size']},
+                          watch_files=[court_model_path]))
+    # A new ball model keeps the stored player detections and the other way round
+    detection_stage.options['player_cache_dir'] = get_detection_cache_dir(
+        graph, Stage('detect_players', None, inputs=player_inputs, config=player_detection_config,
+                     watch_files=[player_model_path]))
+    detection_stage.options['ball_cache_dir'] = get_detection_cache_dir(
+        graph, Stage('detect_ball', None, inputs=['video_path', 'frame_range'], config=ball_detection_config,
+                     watch_files=[ball_model_path]))
+
+    graph.add_stage(Stage('choose_players', choose_players,
+                          inputs=['all_player_detections', 'court_keypoints'],
+                          outputs=['player_detections']))
+    graph.add_stage(Stage('create_mini_court', create_mini_court, inputs=['first_frame'], outputs=['mini_court'], persist=False))
+    graph.add_stage(Stage('detect_ball_shots', detect_ball_shots, inputs=['ball_detections'], outputs=['ball_shot_frames']))
+    graph.add_stage(Stage('project_to_mini_court', project_to_mini_court,
+                          inputs=['mini_court', 'player_detections', 'ball_detections', 'court_keypoints'],
+                          outputs=['player_mini_court_detections', 'ball_mini_court_detections']))
+    graph.add_stage(Stage('calculate_stats', calculate_stats,
+                          inputs=['ball_shot_frames', 'player_mini_court_detections', 'ball_mini_court_detections',
+                                  'mini_court', 'ball_detections'],
+                          outputs=['player_stats_data', 'player_stats_data_df'],
+                          config={'fps': config['fps']}))
+
+    # Outputs written outside the cache, these run every time they are asked for
+    graph.add_stage(Stage('export_analytics', export_analytics,
+                          inputs=['frame_range', 'player_detections', 'ball_detections', 'player_mini_court_detections',
+                                  'ball_mini_court_detections', 'ball_shot_frames', 'player_stats_data_df'],
+                          outputs=['analytics_path'],
+                          config={'analytics_path': get_analytics_path(output_video_path)},
+                          persist=False))
+    graph.add_stage(Stage('index_match', index_match,
+                          inputs=['video_path', 'player_stats_data', 'ball_detections'],
+                          outputs=['match_index_path'],
+                          config={'match_index_path': config['match_index_path'], 'fps': config['fps'],
+                                  'whole_video': frame_range == whole_video_range,
+                                  'player_ids': config['player_ids'], 'match_date': config['match_date']},
+                          persist=False))
+    graph.add_stage(Stage('render_video', render_video,
+                          inputs=['video_path', 'frame_range', 'player_detections', 'ball_detections', 'court_keypoints',
+                                  'mini_court', 'player_mini_court_detections', 'ball_mini_court_detections',
+                                  'player_stats_data_df'],
+                          outputs=['output_video_path'],
+                          config={'output_video_path': output_video_path,
+                                  'player_mini_court_color': config['player_mini_court_color'],
+                                  'ball_mini_court_color': config['ball_mini_court_color'],
+                                  'fps': config['fps']},
+                          options={'queue_size': config['queue_size'],
+                                   'render_workers': config['render_workers'],
+                                   'frame_cache_dir': config['frame_cache_dir'],
+                                   'stats_log_level': config['stats_log_level']},
+                          persist=False))
+
+    return graph
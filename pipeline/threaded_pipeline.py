@@ -0,0 +1,227 @@
+import queue
+import threading
+import time
+
+_END = object()
+
+
+class QueueStats:
+    """Occupancy of a bounded queue, sampled every time an item is put in it."""
+
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = capacity
+        self.samples = 0
+        self.total_occupancy = 0
+        self.max_occupancy = 0
+
+    def sample(self, occupancy):
+        self.samples += 1
+        self.total_occupancy += occupancy
+        self.max_occupancy = max(self.max_occupancy, occupancy)
+
+    @property
+    def mean_occupancy(self):
+        return self.total_occupancy / self.samples if self.samples else 0.0
+
+
+class StageStats:
+    """Time a stage spent working, waiting for input and waiting for room downstream."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.input_wait_seconds = 0.0
+        self.output_wait_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, busy_seconds=0.0, input_wait_seconds=0.0, output_wait_seconds=0.0, items=0):
+        with self.lock:
+            self.items += items
+            self.busy_seconds += busy_seconds
+            self.input_wait_seconds += input_wait_seconds
+            self.output_wait_seconds += output_wait_seconds
+
+
+class ThreadedPipeline:
+    """
+    Runs items through a chain of per-item functions, each stage in its own thread(s).
+
+    Stages are connected by bounded queues, so a slow stage holds back the ones
+    before it instead of letting frames pile up in memory. Results come out in the
+    order of the source even when a stage has several workers. The first exception
+    raised in any thread stops the pipeline and is re-raised in the caller.
+
+    A full queue in front of a stage means the stage is the bottleneck; an empty
+    one means it is starved by the stages before it. ``format_stats`` reports both.
+
+    Args:
+        stages (list): ``(name, function)`` or ``(name, function, workers)`` tuples.
+            Stateful functions (trackers, video writers) must use a single worker.
+        queue_size (int): Capacity of each queue between two stages.
+    """
+
+    def __init__(self, stages, queue_size=8):
+        self.stages = [stage if len(stage) == 3 else (stage[0], stage[1], 1) for stage in stages]
+        self.queue_size = queue_size
+        self.queue_stats = []
+        self.stage_stats = []
+        self.error = None
+        self.stop_event = threading.Event()
+
+    def _fail(self, error):
+        if self.error is None:
+            self.error = error
+        self.stop_event.set()
+
+    def _put(self, output_queue, item, stats):
+        while not self.stop_event.is_set():
+            try:
+                output_queue.put(item, timeout=0.1)
+                stats.sample(output_queue.qsize())
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, input_queue):
+        while not self.stop_event.is_set():
+            try:
+                return input_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _run_source(self, source, output_queue, output_stats, stage_stats):
+        try:
+            sequence_number = 0
+            iterator = iter(source)
+            while not self.stop_event.is_set():
+                start_time = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                read_time = time.perf_counter()
+                if not self._put(output_queue, (sequence_number, item), output_stats):
+                    return
+                stage_stats.add(busy_seconds=read_time - start_time,
+                                output_wait_seconds=time.perf_counter() - read_time, items=1)
+                sequence_number += 1
+            self._put(output_queue, _END, output_stats)
+        except BaseException as e:
+            self._fail(e)
+
+    def _run_worker(self, function, input_queue, output_queue, output_stats, stage_stats, workers_left):
+        # A single worker processes items in source order even when the stage before it
+        # had several workers, stateful functions rely on that
+        ordered = workers_left['count'] == 1
+        pending_items = {}
+        next_sequence_number = 0
+        try:
+            while True:
+                wait_start = time.perf_counter()
+                entry = self._get(input_queue)
+                if entry is _END:
+                    if self.stop_event.is_set():
+                        return
+                    # Let the sibling workers see the end too, the last one forwards it
+                    input_queue.put(_END)
+                    with workers_left['lock']:
+                        workers_left['count'] -= 1
+                        is_last_worker = workers_left['count'] == 0
+                    if is_last_worker:
+                        self._put(output_queue, _END, output_stats)
+                    return
+
+                if ordered:
+                    pending_items[entry[0]] = entry[1]
+                    ready_entries = []
+                    while next_sequence_number in pending_items:
+                        ready_entries.append((next_sequence_number, pending_items.pop(next_sequence_number)))
+                        next_sequence_number += 1
+                else:
+                    ready_entries = [entry]
+
+                for sequence_number, item in ready_entries:
+                    work_start = time.perf_counter()
+                    result = function(item)
+                    work_end = time.perf_counter()
+                    if not self._put(output_queue, (sequence_number, result), output_stats):
+                        return
+                    stage_stats.add(busy_seconds=work_end - work_start,
+                                    input_wait_seconds=work_start - wait_start,
+                                    output_wait_seconds=time.perf_counter() - work_end, items=1)
+                    wait_start = time.perf_counter()
+        except BaseException as e:
+            self._fail(e)
+
+    def run(self, source, source_name='source'):
+        """
+        Feeds ``source`` through the stages.
+
+        ``source`` is iterated in its own thread named ``source_name`` in the stats,
+        e.g. a frame decoder.
+
+        Yields:
+            The result of the last stage for every source item, in source order.
+        """
+        self.queue_stats = []
+        self.stage_stats = [StageStats(source_name)]
+        self.error = None
+        self.stop_event.clear()
+
+        queues = []
+        for i in range(len(self.stages) + 1):
+            queues.append(queue.Queue(maxsize=self.queue_size))
+            name = self.stages[i][0] if i < len(self.stages) else 'output'
+            self.queue_stats.append(QueueStats(f"-> {name}", self.queue_size))
+
+        threads = [threading.Thread(target=self._run_source, daemon=True,
+                                    args=(source, queues[0], self.queue_stats[0], self.stage_stats[0]))]
+        for i, (name, function, workers) in enumerate(self.stages):
+            stage_stats = StageStats(name)
+            self.stage_stats.append(stage_stats)
+            workers_left = {'count': workers, 'lock': threading.Lock()}
+            for _ in range(workers):
+                threads.append(threading.Thread(target=self._run_worker, daemon=True,
+                                                args=(function, queues[i], queues[i + 1], self.queue_stats[i + 1],
+                                                      stage_stats, workers_left)))
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            # Stages with several workers can finish items out of order
+            pending_results = {}
+            next_sequence_number = 0
+            while True:
+                entry = self._get(queues[-1])
+                if entry is _END:
+                    break
+                sequence_number, result = entry
+                pending_results[sequence_number] = result
+                while next_sequence_number in pending_results:
+                    yield pending_results.pop(next_sequence_number)
+                    next_sequence_number += 1
+        finally:
+            # Also stops the threads when the caller abandons the generator
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+    def format_stats(self):
+        """Per-queue occupancy and per-stage busy/wait times of the last run."""
+        lines = []
+        for stats in self.queue_stats:
+            lines.append(f"queue {stats.name:20s} mean {stats.mean_occupancy:5.1f} / {stats.capacity}  "
+                         f"max {stats.max_occupancy}")
+        for stats in self.stage_stats:
+            lines.append(f"stage {stats.name:20s} items {stats.items:6d}  busy {stats.busy_seconds:7.2f}s  "
+                         f"waiting for input {stats.input_wait_seconds:7.2f}s  "
+                         f"waiting for output {stats.output_wait_seconds:7.2f}s")
+        return "\n".join(lines)
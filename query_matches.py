@@ -0,0 +1,53 @@
+import argparse
+from datetime import datetime
+from match_index import MatchIndex
+
+
+def parse_date(value):
+    return datetime.fromisoformat(value).timestamp()
+
+
+def format_date(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M')
+
+
+def format_speed(value):
+    return f"{value:7.1f}" if value is not None else "      -"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the stats of every processed match.")
+    parser.add_argument('--db', default="output_videos/match_index.sqlite")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for command in ('fastest-shots', 'players', 'matches'):
+        subparser = subparsers.add_parser(command)
+        subparser.add_argument('--since', type=parse_date, help="ISO date, e.g. 2026-09-01")
+        subparser.add_argument('--until', type=parse_date, help="ISO date, exclusive")
+        if command != 'players':
+            subparser.add_argument('--limit', type=int, default=10)
+        if command == 'fastest-shots':
+            subparser.add_argument('--player', help="Player identity given when the match was indexed")
+    args = parser.parse_args()
+
+    with MatchIndex(args.db) as match_index:
+        if args.command == 'fastest-shots':
+            for shot in match_index.fastest_shots(args.player, args.since, args.until, args.limit):
+                print(f"{shot['shot_speed']:7.1f} km/h  {shot['player_id']}  "
+                      f"{format_date(shot['match_date'])}  t={shot['time_seconds']:7.1f}s  "
+                      f"frame {shot['frame_num']:6d}  {shot['video_path']}")
+        elif args.command == 'players':
+            print(f"{'player':20s}  shots  avg shot  max shot  avg speed  max speed (km/h)")
+            for player in match_index.player_summary(args.since, args.until):
+                print(f"{player['player_id']:20s}  {player['number_of_shots']:5d}  "
+                      f"{format_speed(player.get('average_shot_speed'))}   {format_speed(player.get('max_shot_speed'))}  "
+                      f"{format_speed(player.get('average_player_speed'))}    {format_speed(player.get('max_player_speed'))}")
+        else:
+            for match in match_index.matches(args.since, args.until, args.limit):
+                print(f"{format_date(match['match_date'])}  {match['number_of_shots']:4d} shots  "
+                      f"{match['num_frames']:7d} frames  {match['player_1_id']} vs {match['player_2_id']}  "
+                      f"{match['match_id'][:12]}  {match['video_path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import argparse
+import time
+from trackers import PlayerTracker, BallTracker
+from court_line_detector import CourtLineDetector
+from model_optimization.model_comparison import summarize_detection_agreement
+from utils import sample_video_frames, InferenceFrame, get_center_of_bbox, measure_distance
+
+
+def run_detector(detector, frames):
+    """Runs ``detector.detect_frame`` over the frames, returns the detections and ms per frame."""
+    inference_frames = [InferenceFrame(frame) for frame in frames]
+    start_time = time.perf_counter()
+    detections = [detector.detect_frame(inference_frame) for inference_frame in inference_frames]
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    return detections, elapsed_ms / len(frames)
+
+
+def sweep_detector(name, create_detector, widths, frames):
+    reference_detections, reference_ms = run_detector(create_detector(None), frames)
+    reference_boxes = [list(detection.values()) for detection in reference_detections]
+    print(f"{name}: full resolution {reference_ms:.1f} ms/frame")
+
+    for width in widths:
+        detections, ms_per_frame = run_detector(create_detector(width), frames)
+        agreement = summarize_detection_agreement(reference_boxes, [list(detection.values()) for detection in detections])
+
+        center_errors = [
+            measure_distance(get_center_of_bbox(reference_box), get_center_of_bbox(box))
+            for reference_detection, detection in zip(reference_detections, detections)
+            for reference_box, box in zip(reference_detection.values(), detection.values())
+        ]
+        mean_center_error = sum(center_errors) / len(center_errors) if center_errors else float('nan')
+        print(f"  width {width:5d}: {ms_per_frame:7.1f} ms/frame  speedup {reference_ms / ms_per_frame:5.2f}x  "
+              f"recall {agreement['recall']:.3f}  mean IoU {agreement['mean_iou']:.3f}  "
+              f"center error {mean_center_error:.1f} px")
+
+
+def sweep_court_detector(model_path, input_sizes, frames):
+    reference_detector = CourtLineDetector(model_path)
+    reference_keypoints = [reference_detector.predict(frame) for frame in frames]
+    print(f"court: reference input size {reference_detector.input_size}")
+
+    for input_size in input_sizes:
+        detector = CourtLineDetector(model_path, input_size=input_size)
+        start_time = time.perf_counter()
+        keypoints = [detector.predict(frame) for frame in frames]
+        ms_per_frame = (time.perf_counter() - start_time) * 1000 / len(frames)
+
+        errors = [
+            measure_distance(reference_frame_keypoints[i:i+2], frame_keypoints[i:i+2])
+            for reference_frame_keypoints, frame_keypoints in zip(reference_keypoints, keypoints)
+            for i in range(0, len(frame_keypoints), 2)
+        ]
+        print(f"  input {input_size:4d}: {ms_per_frame:7.1f} ms/frame  "
+              f"mean keypoint error {sum(errors) / len(errors):.1f} px  max {max(errors):.1f} px")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the speed/accuracy trade-off of the inference "
+                                                 "resolution of each model against full resolution.")
+    parser.add_argument('--video', default="input_videos/1.mp4")
+    parser.add_argument('--num-frames', type=int, default=48)
+    parser.add_argument('--widths', type=int, nargs='+', default=[1280, 960, 640, 480])
+    parser.add_argument('--court-input-sizes', type=int, nargs='+', default=[224, 192, 160, 128])
+    parser.add_argument('--player-model', default='yolov8x')
+    parser.add_argument('--ball-model', default='models/last.pt')
+    parser.add_argument('--court-model', default='models/keypoints_model.pth')
+    args = parser.parse_args()
+
+    frames = sample_video_frames(args.video, args.num_frames)
+
+    sweep_detector('players', lambda width: PlayerTracker(args.player_model, inference_width=width), args.widths, frames)
+    sweep_detector('ball', lambda width: BallTracker(args.ball_model, inference_width=width), args.widths, frames)
+    sweep_court_detector(args.court_model, args.court_input_sizes, frames)
+
+
+if __name__ == "__main__":
+    main()
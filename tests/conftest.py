@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The packages of the repository are imported from its root, like main.py does
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,124 @@
+import random
+import numpy as np
+import pytest
+from trackers import BallInterpolator, BallTracker
+
+
+def make_detections(num_frames, detection_rate, seed):
+    rng = random.Random(seed)
+    detections = []
+    for _ in range(num_frames):
+        if rng.random() < detection_rate:
+            x, y = rng.uniform(0, 1900), rng.uniform(0, 1060)
+            detections.append({1: [x, y, x + 20, y + 20]})
+        else:
+            detections.append({})
+    return detections
+
+
+def stream(detections, max_lag, motion_model='hold'):
+    """Pushes the detections one by one, recording how many frames were pushed when each came out (None for flush)."""
+    interpolator = BallInterpolator(max_lag=max_lag, motion_model=motion_model)
+    released = []
+    for pushed, ball_dict in enumerate(detections, start=1):
+        released.extend((frame_num, ball_dict, pushed) for frame_num, ball_dict in interpolator.push(ball_dict))
+    released.extend((frame_num, ball_dict, None) for frame_num, ball_dict in interpolator.flush())
+    return released
+
+
+def longest_gap(detections):
+    longest = current = 0
+    for ball_dict in detections:
+        current = 0 if 1 in ball_dict else current + 1
+        longest = max(longest, current)
+    return longest
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('motion_model', BallInterpolator.MOTION_MODELS)
+def test_stream_matches_batch_when_lag_covers_every_gap(seed, motion_model):
+    detections = make_detections(300, 0.3, seed)
+    batch = BallTracker.interpolate_ball_positions(detections)
+
+    streamed = stream(detections, max_lag=longest_gap(detections), motion_model=motion_model)
+
+    assert [ball_dict for _, ball_dict, _ in streamed] == batch
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('max_lag', [0, 1, 5, 24])
+@pytest.mark.parametrize('motion_model', BallInterpolator.MOTION_MODELS)
+def test_stream_has_batch_shape(seed, max_lag, motion_model):
+    detections = make_detections(300, 0.2, seed)
+    batch = BallTracker.interpolate_ball_positions(detections)
+
+    streamed = stream(detections, max_lag, motion_model)
+
+    assert [frame_num for frame_num, _, _ in streamed] == list(range(len(detections)))
+    assert [set(ball_dict) for _, ball_dict, _ in streamed] == [set(ball_dict) for ball_dict in batch]
+    for (frame_num, ball_dict, _), detection in zip(streamed, detections):
+        if 1 in detection:
+            assert ball_dict == detection
+
+
+@pytest.mark.parametrize('max_lag', [0, 3, 10])
+def test_stream_lag_is_bounded_after_first_detection(max_lag):
+    detections = [{}] * 4 + make_detections(200, 0.1, seed=1)
+    first_detection = next(frame_num for frame_num, ball_dict in enumerate(detections) if 1 in ball_dict)
+
+    for frame_num, _, pushed in stream(detections, max_lag):
+        if frame_num > first_detection and pushed is not None:
+            assert pushed - 1 - frame_num <= max_lag
+
+
+def test_frames_before_first_detection_get_first_position():
+    detections = [{}] * 5 + [{1: [10, 20, 30, 40]}, {}]
+
+    streamed = stream(detections, max_lag=2)
+
+    assert [ball_dict for _, ball_dict, _ in streamed] == [{1: [10.0, 20.0, 30.0, 40.0]}] * 7
+
+
+def test_video_without_ball_stays_empty():
+    streamed = stream([{}] * 10, max_lag=3)
+
+    assert [ball_dict for _, ball_dict, _ in streamed] == [{}] * 10
+    assert BallTracker.interpolate_ball_positions([{}] * 10) == [{}] * 10
+
+
+def test_velocity_extrapolates_from_detections_only():
+    detections = [{1: [0, 0, 10, 10]}, {1: [10, 0, 20, 10]}] + [{}] * 6
+
+    streamed = stream(detections, max_lag=2, motion_model='velocity')
+
+    x1 = [ball_dict[1][0] for _, ball_dict, _ in streamed]
+    # 10 px per frame for at most max_lag frames, then the end of the video holds the last position
+    assert x1 == [0, 10, 20, 30, 30, 30, 30, 30]
+
+
+def test_flush_holds_last_position():
+    detections = [{1: [0, 0, 10, 10]}, {1: [10, 0, 20, 10]}] + [{}] * 4
+
+    for motion_model in BallInterpolator.MOTION_MODELS:
+        streamed = stream(detections, max_lag=None, motion_model=motion_model)
+        assert [ball_dict for _, ball_dict, _ in streamed][2:] == [{1: [10.0, 0.0, 20.0, 10.0]}] * 4
+
+
+def test_stream_ball_positions_consumes_generator():
+    detections = make_detections(100, 0.3, seed=7)
+
+    streamed = BallTracker.stream_ball_positions((ball_dict for ball_dict in detections), max_lag=4)
+
+    assert [frame_num for frame_num, _ in streamed] == list(range(100))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_batch_matches_pandas_interpolation(seed):
+    pd = pytest.importorskip('pandas')
+    detections = make_detections(200, 0.25, seed)
+
+    df = pd.DataFrame([ball_dict.get(1, []) for ball_dict in detections], columns=['x1', 'y1', 'x2', 'y2'])
+    expected = df.interpolate().bfill().to_numpy().tolist()
+
+    batch = BallTracker.interpolate_ball_positions(detections)
+    np.testing.assert_allclose(np.array([ball_dict[1] for ball_dict in batch]), np.array(expected))
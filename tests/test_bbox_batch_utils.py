@@ -0,0 +1,193 @@
+import math
+import random
+import numpy as np
+import pytest
+from utils import (get_center_of_bbox,
+                   get_foot_position,
+                   measure_distance,
+                   measure_xy_distance,
+                   get_closest_keypoint_index,
+                   get_height_of_bbox,
+                   as_keypoint_matrix,
+                   get_centers_of_bboxes,
+                   get_foot_positions,
+                   measure_distances,
+                   measure_xy_distances,
+                   get_closest_keypoint_indices,
+                   get_windowed_max)
+from mini_court import MiniCourt
+
+SEEDS = range(10)
+
+
+def random_bboxes(rng, count, integer=False):
+    bboxes = []
+    for _ in range(count):
+        x1, y1 = rng.uniform(0, 1800), rng.uniform(0, 1000)
+        bbox = [x1, y1, x1 + rng.uniform(1, 120), y1 + rng.uniform(1, 250)]
+        bboxes.append([float(round(x)) for x in bbox] if integer else bbox)
+    return bboxes
+
+
+def random_court_keypoints(rng):
+    # Integer y values make ties between keypoints likely
+    return [float(rng.randint(0, 1900)) if i % 2 == 0 else float(rng.randint(0, 1060)) for i in range(28)]
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('integer', [False, True])
+def test_centers_and_feet_match_scalar(seed, integer):
+    rng = random.Random(seed)
+    bboxes = random_bboxes(rng, rng.randint(1, 50), integer)
+
+    assert get_centers_of_bboxes(bboxes).tolist() == [list(get_center_of_bbox(bbox)) for bbox in bboxes]
+    assert get_foot_positions(bboxes).tolist() == [list(get_foot_position(bbox)) for bbox in bboxes]
+
+
+def test_empty_inputs():
+    assert get_centers_of_bboxes([]).shape == (0, 2)
+    assert get_foot_positions([]).shape == (0, 2)
+    assert measure_distances(np.empty((0, 2)), np.empty((0, 2))).shape == (0,)
+    assert measure_xy_distances(np.empty((0, 2)), np.empty((0, 2))).shape == (0, 2)
+    assert get_closest_keypoint_indices([], as_keypoint_matrix([0.0] * 28), [0, 2, 12, 13]).shape == (0,)
+    assert get_windowed_max(np.empty(0), 20, 50).shape == (0,)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_distances_match_scalar(seed):
+    rng = random.Random(seed)
+    count = rng.randint(1, 50)
+    points1 = [(rng.uniform(-500, 2000), rng.uniform(-500, 1500)) for _ in range(count)]
+    points2 = [(rng.uniform(-500, 2000), rng.uniform(-500, 1500)) for _ in range(count)]
+
+    assert measure_distances(points1, points2) == pytest.approx(
+        [measure_distance(p1, p2) for p1, p2 in zip(points1, points2)])
+    np.testing.assert_allclose(measure_xy_distances(points1, points2),
+                               np.array([measure_xy_distance(p1, p2) for p1, p2 in zip(points1, points2)]))
+    # A single point broadcasts against every row
+    assert measure_distances(points1, points2[0]) == pytest.approx(
+        [measure_distance(p1, points2[0]) for p1 in points1])
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_closest_keypoint_indices_match_scalar(seed):
+    rng = random.Random(seed)
+    keypoints = random_court_keypoints(rng)
+    keypoint_indices = [0, 2, 12, 13]
+    # Some points share the y of a keypoint, so ties are exercised
+    points = [(rng.uniform(0, 1900), rng.choice([rng.uniform(0, 1060), keypoints[2 * rng.choice(keypoint_indices) + 1]]))
+              for _ in range(rng.randint(1, 50))]
+
+    assert get_closest_keypoint_indices(points, as_keypoint_matrix(keypoints), keypoint_indices).tolist() == [
+        get_closest_keypoint_index(point, keypoints, keypoint_indices) for point in points]
+
+
+def scalar_windowed_max(values, window_before, window_after):
+    window_max = []
+    for i in range(len(values)):
+        window = [value for value in values[max(0, i - window_before):min(len(values), i + window_after)]
+                  if not math.isnan(value)]
+        window_max.append(max(window) if window else math.nan)
+    return window_max
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('missing_rate', [0.0, 0.3, 0.9, 1.0])
+def test_windowed_max_matches_scalar(seed, missing_rate):
+    rng = random.Random(seed)
+    values = [math.nan if rng.random() < missing_rate else rng.uniform(0, 300) for _ in range(rng.randint(1, 200))]
+
+    np.testing.assert_array_equal(get_windowed_max(np.asarray(values), 20, 50), scalar_windowed_max(values, 20, 50))
+
+
+def scalar_convert_bounding_boxes_to_mini_court_coordinates(mini_court, player_boxes, ball_boxes,
+                                                            original_court_key_points, default_player_height=1.8):
+    """The per-box conversion MiniCourt used before it was vectorized."""
+    output_player_boxes = []
+    output_ball_boxes = []
+
+    for frame_num, player_bbox in enumerate(player_boxes):
+        ball_position = get_center_of_bbox(ball_boxes[frame_num][1])
+        closest_player_id_to_ball = min(player_bbox.keys(),
+                                        key=lambda x: measure_distance(ball_position, get_center_of_bbox(player_bbox[x])))
+
+        output_player_bboxes_dict = {}
+        for player_id, bbox in player_bbox.items():
+            foot_position = get_foot_position(bbox)
+            closest_key_point_index = get_closest_keypoint_index(foot_position, original_court_key_points, [0, 2, 12, 13])
+            closest_key_point = (original_court_key_points[closest_key_point_index * 2],
+                                 original_court_key_points[closest_key_point_index * 2 + 1])
+
+            frame_index_min = max(0, frame_num - 20)
+            frame_index_max = min(len(player_boxes), frame_num + 50)
+            bboxes_heights_in_pixels = [get_height_of_bbox(player_boxes[i][player_id])
+                                        for i in range(frame_index_min, frame_index_max) if player_id in player_boxes[i]]
+            max_player_height_in_pixels = max(bboxes_heights_in_pixels) if bboxes_heights_in_pixels else 1
+
+            output_player_bboxes_dict[player_id] = mini_court.get_mini_court_coordinates(
+                foot_position, closest_key_point, closest_key_point_index, max_player_height_in_pixels,
+                default_player_height)
+
+            if closest_player_id_to_ball == player_id:
+                closest_key_point_index = get_closest_keypoint_index(ball_position, original_court_key_points, [0, 2, 12, 13])
+                closest_key_point = (original_court_key_points[closest_key_point_index * 2],
+                                     original_court_key_points[closest_key_point_index * 2 + 1])
+                output_ball_boxes.append({1: mini_court.get_mini_court_coordinates(
+                    ball_position, closest_key_point, closest_key_point_index, max_player_height_in_pixels,
+                    default_player_height)})
+
+        output_player_boxes.append(output_player_bboxes_dict)
+
+    return output_player_boxes, output_ball_boxes
+
+
+def random_player_and_ball_boxes(rng, num_frames, missing_rate):
+    player_boxes = []
+    ball_boxes = []
+    for _ in range(num_frames):
+        # A player can be missing from a frame, but never both
+        player_ids = [player_id for player_id in (1, 2) if rng.random() >= missing_rate]
+        player_ids = player_ids or [rng.choice((1, 2))]
+        player_boxes.append(dict(zip(player_ids, random_bboxes(rng, len(player_ids)))))
+        ball_boxes.append({1: random_bboxes(rng, 1)[0]})
+    return player_boxes, ball_boxes
+
+
+def assert_positions_equal(actual, expected):
+    assert len(actual) == len(expected)
+    for actual_frame, expected_frame in zip(actual, expected):
+        assert list(actual_frame) == list(expected_frame)
+        for key in expected_frame:
+            assert actual_frame[key] == pytest.approx(expected_frame[key])
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('missing_rate', [0.0, 0.4])
+def test_mini_court_conversion_matches_scalar(seed, missing_rate):
+    rng = random.Random(seed)
+    mini_court = MiniCourt(np.zeros((1080, 1920, 3), dtype=np.uint8))
+    court_keypoints = random_court_keypoints(rng)
+    player_boxes, ball_boxes = random_player_and_ball_boxes(rng, rng.randint(1, 150), missing_rate)
+
+    player_positions, ball_positions = mini_court.convert_bounding_boxes_to_mini_court_coordinates(
+        player_boxes, ball_boxes, court_keypoints)
+    expected_player_positions, expected_ball_positions = scalar_convert_bounding_boxes_to_mini_court_coordinates(
+        mini_court, player_boxes, ball_boxes, court_keypoints)
+
+    assert_positions_equal(player_positions, expected_player_positions)
+    assert_positions_equal(ball_positions, expected_ball_positions)
+
+
+def test_mini_court_conversion_of_no_frames():
+    mini_court = MiniCourt(np.zeros((1080, 1920, 3), dtype=np.uint8))
+
+    assert mini_court.convert_bounding_boxes_to_mini_court_coordinates([], [], [0.0] * 28) == ([], [])
+
+
+def test_mini_court_conversion_rejects_frame_without_players():
+    mini_court = MiniCourt(np.zeros((1080, 1920, 3), dtype=np.uint8))
+    player_boxes = [{1: [10.0, 10.0, 50.0, 100.0]}, {}]
+    ball_boxes = [{1: [20.0, 20.0, 25.0, 25.0]}] * 2
+
+    with pytest.raises(ValueError):
+        mini_court.convert_bounding_boxes_to_mini_court_coordinates(player_boxes, ball_boxes, [0.0] * 28)
@@ -0,0 +1,45 @@
+from match_index import MatchIndex, get_shot_events
+from utils import calculate_player_stats
+
+
+def make_detections():
+    # Player 1 near the top of the mini court, player 2 near the bottom, the ball crosses between them
+    player_mini_court_detections = [{1: (100.0, 50.0 + frame_num), 2: (100.0, 450.0 - frame_num)} for frame_num in range(60)]
+    ball_mini_court_detections = [{1: (100.0, 50.0 + 10 * (frame_num % 40))} for frame_num in range(60)]
+    return player_mini_court_detections, ball_mini_court_detections
+
+
+def test_every_shot_with_a_ball_is_recorded():
+    player_mini_court_detections, ball_mini_court_detections = make_detections()
+
+    player_stats_data = calculate_player_stats([0, 40, 55], player_mini_court_detections, ball_mini_court_detections,
+                                               mini_court_width=250)
+
+    assert [row['frame_num'] for row in player_stats_data] == [0, 0, 40]
+    assert player_stats_data[-1]['player_1_number_of_shots'] == 2
+    assert player_stats_data[-1]['player_1_last_shot_speed'] > 0
+    assert player_stats_data[-1]['player_2_last_player_speed'] > 0
+
+
+def test_shots_without_a_ball_position_are_skipped():
+    player_mini_court_detections, ball_mini_court_detections = make_detections()
+    ball_mini_court_detections[40] = {}
+
+    player_stats_data = calculate_player_stats([0, 40, 55, 70], player_mini_court_detections,
+                                               ball_mini_court_detections, mini_court_width=250)
+
+    # 0 -> 40 and 40 -> 55 miss the ball at frame 40, 55 -> 70 ends after the last frame
+    assert len(player_stats_data) == 1
+
+
+def test_indexed_match_has_player_stats(tmp_path):
+    player_mini_court_detections, ball_mini_court_detections = make_detections()
+    player_stats_data = calculate_player_stats([0, 40, 55], player_mini_court_detections, ball_mini_court_detections,
+                                               mini_court_width=250)
+
+    with MatchIndex(str(tmp_path / 'index.sqlite')) as match_index:
+        match_index.add_match('match', 'match.mp4', get_shot_events(player_stats_data), num_frames=60,
+                              player_ids=('Alice', 'Bob'), match_date=1.0e9)
+        summary = match_index.player_summary()
+
+    assert [(player['player_id'], player['number_of_shots']) for player in summary] == [('Alice', 2), ('Bob', 0)]
@@ -1,2 +1,4 @@
 from .player_tracker import PlayerTracker
-from .ball_tracker import BallTracker
\ No newline at end of file
+from .ball_tracker import BallTracker
+from .ball_interpolator import BallInterpolator
+from .court_region import CourtRegion
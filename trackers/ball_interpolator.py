@@ -0,0 +1,123 @@
+from collections import deque
+
+
+class BallInterpolator:
+    """
+    Incrementally fills in frames where the ball was not detected.
+
+    Frames without a detection are held back until the next detection arrives and
+    are then filled linearly between the two detections. When more than ``max_lag``
+    frames are waiting, the oldest one is released using the motion model so the
+    output never falls more than ``max_lag`` frames behind the input. Frames before
+    the first detection are always held until it arrives and get its position, and
+    frames after the last detection repeat it, like the whole-match interpolation.
+
+    Args:
+        max_lag (int or None): Maximum number of frames to hold back. ``None`` waits
+            for the next detection however long the gap is, which gives the same
+            result as interpolating the whole match at once.
+        motion_model (str): How frames are filled when the lag limit is reached:
+            ``'hold'`` repeats the last known position, ``'velocity'`` extrapolates
+            with the velocity of the last two detections, for at most ``max_lag``
+            frames after the last detection.
+    """
+
+    MOTION_MODELS = ('hold', 'velocity')
+
+    def __init__(self, max_lag=None, motion_model='hold'):
+        if max_lag is not None and max_lag < 0:
+            raise ValueError("max_lag must be None or a non-negative number of frames.")
+        if motion_model not in self.MOTION_MODELS:
+            raise ValueError(f"Unknown motion model: {motion_model}")
+
+        self.max_lag = max_lag
+        self.motion_model = motion_model
+
+        self.next_frame_num = 0
+        self.pending_frames = deque()
+        # Last position given to a frame, detected or filled
+        self.last_position = None
+        # Last two actual detections, the velocity model only extrapolates from those
+        self.last_detection = None
+        self.previous_detection = None
+
+    def push(self, ball_dict):
+        """
+        Adds the detections of the next frame.
+
+        Returns:
+            list: ``(frame_num, ball_dict)`` tuples that are ready, in frame order.
+        """
+        frame_num = self.next_frame_num
+        self.next_frame_num += 1
+        ready_frames = []
+
+        bbox = (ball_dict or {}).get(1)
+        if bbox is None:
+            self.pending_frames.append(frame_num)
+            # Before the first detection there is nothing to fill with yet
+            if self.max_lag is not None and self.last_position is not None:
+                while len(self.pending_frames) > self.max_lag:
+                    ready_frames.append(self._release_oldest_pending_frame(self._predict))
+            return ready_frames
+
+        bbox = [float(x) for x in bbox]
+        while self.pending_frames:
+            pending_frame_num = self.pending_frames.popleft()
+            if self.last_position is None:
+                # No earlier detection, use the first one (same as a backward fill)
+                pending_bbox = list(bbox)
+            else:
+                pending_bbox = self._interpolate(self.last_position, (frame_num, bbox), pending_frame_num)
+            self.last_position = (pending_frame_num, pending_bbox)
+            ready_frames.append((pending_frame_num, {1: pending_bbox}))
+
+        self.last_position = (frame_num, bbox)
+        self.previous_detection = self.last_detection
+        self.last_detection = (frame_num, bbox)
+        ready_frames.append((frame_num, {1: bbox}))
+        return ready_frames
+
+    def flush(self):
+        """
+        Releases every frame still held back, to be called after the last frame.
+
+        Frames after the last detection repeat the last known position, frames of a
+        video without any detection stay empty.
+
+        Returns:
+            list: ``(frame_num, ball_dict)`` tuples in frame order.
+        """
+        ready_frames = []
+        while self.pending_frames:
+            ready_frames.append(self._release_oldest_pending_frame(self._hold))
+        return ready_frames
+
+    def _release_oldest_pending_frame(self, fill):
+        frame_num = self.pending_frames.popleft()
+        if self.last_position is None:
+            # The ball was never seen
+            return frame_num, {}
+
+        bbox = fill(frame_num)
+        self.last_position = (frame_num, bbox)
+        return frame_num, {1: bbox}
+
+    def _hold(self, frame_num):
+        return list(self.last_position[1])
+
+    def _predict(self, frame_num):
+        if self.motion_model != 'velocity' or self.previous_detection is None:
+            return self._hold(frame_num)
+
+        last_frame_num, last_bbox = self.last_detection
+        previous_frame_num, previous_bbox = self.previous_detection
+        # A long gap would carry the ball off the frame, stop extrapolating after max_lag frames
+        steps = min(frame_num - last_frame_num, self.max_lag) / (last_frame_num - previous_frame_num)
+        return [last + (last - previous) * steps for last, previous in zip(last_bbox, previous_bbox)]
+
+    def _interpolate(self, start, end, frame_num):
+        start_frame_num, start_bbox = start
+        end_frame_num, end_bbox = end
+        ratio = (frame_num - start_frame_num) / (end_frame_num - start_frame_num)
+        return [a + (b - a) * ratio for a, b in zip(start_bbox, end_bbox)]
@@ -1,24 +1,50 @@
-from ultralytics import YOLO 
 import cv2
 import pickle
-import pandas as pd
+import sys
+sys.path.append('../')
+from model_optimization import resolve_model_path, get_yolo_input_size
+from utils import as_inference_frame, get_inference_image_size, scale_bbox_to_original
+from .ball_interpolator import BallInterpolator
 
 class BallTracker:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
+    def __init__(self, model_path, use_optimized=False, inference_width=None):
+        self.model_path = resolve_model_path(model_path, use_optimized, get_yolo_input_size(inference_width))
+        self._model = None
+        # None runs on full resolution frames
+        self.inference_width = inference_width
 
-    def interpolate_ball_positions(self, ball_positions):
-        ball_positions = [x.get(1, []) for x in ball_positions]
-        # convert the list into pandas dataframe
-        df_ball_positions = pd.DataFrame(ball_positions, columns=['x1', 'y1', 'x2', 'y2'])
+    @property
+    def model(self):
+        # Loaded on first use, like PlayerTracker.model
+        if self._model is None:
+            from ultralytics import YOLO
+            self._model = YOLO(self.model_path, task='detect')
+        return self._model
+
+    @staticmethod
+    def interpolate_ball_positions(ball_positions, max_lag=None, motion_model='hold'):
+        # Same result as streaming, without a lag limit every gap is filled between its two detections
+        return [ball_dict for _, ball_dict in BallTracker.stream_ball_positions(ball_positions, max_lag, motion_model)]
+
+    @staticmethod
+    def stream_ball_positions(ball_positions, max_lag=None, motion_model='hold'):
+        """
+        Interpolates detections while they are still coming in, e.g. from a generator fed
+        by the detector, yielding each position at most ``max_lag`` frames behind.
+        See ``BallInterpolator`` for ``max_lag`` and ``motion_model``.
 
-        # interpolate the missing values
-        df_ball_positions = df_ball_positions.interpolate().bfill()
-        ball_positions = [{1: x} for x in df_ball_positions.to_numpy().tolist()]
+        Yields:
+            tuple: ``(frame_num, ball_dict)`` in frame order.
+        """
+        interpolator = BallInterpolator(max_lag=max_lag, motion_model=motion_model)
+        for ball_dict in ball_positions:
+            yield from interpolator.push(ball_dict)
+        yield from interpolator.flush()
 
-        return ball_positions
+    @staticmethod
+    def get_ball_shot_frames(ball_positions):
+        import pandas as pd
 
-    def get_ball_shot_frames(self, ball_positions):
         ball_positions = [x.get(1, []) for x in ball_positions]
         df_ball_positions = pd.DataFrame(ball_positions, columns=['x1', 'y1', 'x2', 'y2'])
         df_ball_positions['ball_hit'] = 0
@@ -64,11 +90,16 @@ class BallTracker:
         return ball_detections
 
     def detect_frame(self, frame):
-        results = self.model.predict(frame, conf=0.15)[0]
-        ball_dict = {1: box.xyxy.tolist()[0] for box in results.boxes}
+        image, scale = as_inference_frame(frame).at_width(self.inference_width)
+        if self.inference_width is None:
+            results = self.model.predict(image, conf=0.15)[0]
+        else:
+            results = self.model.predict(image, conf=0.15, imgsz=get_inference_image_size(image))[0]
+        ball_dict = {1: scale_bbox_to_original(box.xyxy.tolist()[0], scale) for box in results.boxes}
         return ball_dict
 
-    def draw_bboxes(self, video_frames, player_detections):
+    @staticmethod
+    def draw_bboxes(video_frames, player_detections):
         output_video_frames = []
         for frame, ball_dict in zip(video_frames, player_detections):
             for track_id, bbox in ball_dict.items():
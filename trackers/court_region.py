@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import sys
+sys.path.append('../')
+from utils import get_foot_position, as_keypoint_matrix
+
+
+class CourtRegion:
+    """
+    The court area of the frame, from the court keypoints, grown by a margin so players
+    behind the baseline or outside the side lines are kept.
+
+    Used to run the player detector on the court only and to drop spectators, ball
+    kids and umpires while detecting instead of after the whole video was tracked.
+
+    Args:
+        court_keypoints (list): Flat [x0, y0, x1, y1, ...] keypoints of the court model.
+        margin (float): How much the court polygon is grown around its center, 0.3 is 30%.
+    """
+
+    def __init__(self, court_keypoints, margin=0.3):
+        self.margin = margin
+        keypoints = as_keypoint_matrix(court_keypoints).astype(np.float32)
+        hull = cv2.convexHull(keypoints).reshape(-1, 2)
+        center = hull.mean(axis=0)
+        self.polygon = (center + (hull - center) * (1 + margin)).astype(np.float32)
+
+        # The crop also has room above the polygon for the upper body of the far player
+        x, y, width, height = cv2.boundingRect(self.polygon)
+        head_room = int(height * margin)
+        self.bounds = (x, y - head_room, x + width, y + height)
+
+    def get_crop_rect(self, frame_shape):
+        """(x1, y1, x2, y2) of the crop, clipped to the frame."""
+        frame_height, frame_width = frame_shape[:2]
+        x1, y1, x2, y2 = self.bounds
+        return max(0, x1), max(0, y1), min(frame_width, x2), min(frame_height, y2)
+
+    def crop(self, frame):
+        """
+        Returns:
+            tuple: (view of the court part of the frame, (x, y) offset of the crop in the frame)
+        """
+        x1, y1, x2, y2 = self.get_crop_rect(frame.shape)
+        return frame[y1:y2, x1:x2], (x1, y1)
+
+    def scale_inference_width(self, inference_width, frame_shape):
+        """The crop's inference width that keeps the pixel scale of ``inference_width`` for the whole frame."""
+        if inference_width is None:
+            return None
+        x1, _, x2, _ = self.get_crop_rect(frame_shape)
+        return max(32, round(inference_width * (x2 - x1) / frame_shape[1]))
+
+    def contains(self, bbox):
+        """Whether the foot of the box stands inside the grown court polygon."""
+        foot_x, foot_y = get_foot_position(bbox)
+        return cv2.pointPolygonTest(self.polygon, (float(foot_x), float(foot_y)), False) >= 0
@@ -1,36 +1,45 @@
-from ultralytics import YOLO 
 import cv2
 import pickle
 import sys
 sys.path.append('../')
-from utils import measure_distance, get_center_of_bbox
+from utils import as_keypoint_matrix, get_centers_of_bboxes, get_min_distances_to_keypoints, as_inference_frame, InferenceFrame, get_inference_image_size, scale_bbox_to_original
+from model_optimization import resolve_model_path, get_yolo_input_size
 
 class PlayerTracker:
-    def __init__(self,model_path):
-        self.model = YOLO(model_path)
+    def __init__(self,model_path, use_optimized=False, inference_width=None, court_region=None):
+        self.model_path = resolve_model_path(model_path, use_optimized, get_yolo_input_size(inference_width))
+        self._model = None
+        # None runs on full resolution frames
+        self.inference_width = inference_width
+        # A CourtRegion limits detection to the court and a margin around it
+        self.court_region = court_region
 
-    def choose_and_filter_players(self, court_keypoints, player_detections):
+    @property
+    def model(self):
+        # Loaded on first use, runs whose detections are all cached never import ultralytics
+        if self._model is None:
+            from ultralytics import YOLO
+            self._model = YOLO(self.model_path, task='detect')
+        return self._model
+
+    @staticmethod
+    def choose_and_filter_players(court_keypoints, player_detections):
         player_detections_first_frame = player_detections[0]
-        chosen_player = self.choose_players(court_keypoints, player_detections_first_frame)
+        chosen_player = PlayerTracker.choose_players(court_keypoints, player_detections_first_frame)
         filtered_player_detections = []
         for player_dict in player_detections:
             filtered_player_dict = {track_id: bbox for track_id, bbox in player_dict.items() if track_id in chosen_player}
             filtered_player_detections.append(filtered_player_dict)
         return filtered_player_detections
 
-    def choose_players(self, court_keypoints, player_dict):
-        distances = []
-        for track_id, bbox in player_dict.items():
-            player_center = get_center_of_bbox(bbox)
+    @staticmethod
+    def choose_players(court_keypoints, player_dict):
+        track_ids = list(player_dict.keys())
+        player_centers = get_centers_of_bboxes([player_dict[track_id] for track_id in track_ids])
+        # Distance of each player to the nearest court keypoint
+        min_distances = get_min_distances_to_keypoints(player_centers, as_keypoint_matrix(court_keypoints))
+        distances = list(zip(track_ids, min_distances.tolist()))
 
-            min_distance = float('inf')
-            for i in range(0,len(court_keypoints),2):
-                court_keypoint = (court_keypoints[i], court_keypoints[i+1])
-                distance = measure_distance(player_center, court_keypoint)
-                if distance < min_distance:
-                    min_distance = distance
-            distances.append((track_id, min_distance))
-        
         # sorrt the distances in ascending order
         distances.sort(key = lambda x: x[1])
         # Choose the first 2 tracks
@@ -57,21 +66,40 @@ class PlayerTracker:
         return player_detections
 
     def detect_frame(self,frame):
-        results = self.model.track(frame, persist=True)[0]
+        offset_x, offset_y = 0, 0
+        if self.court_region is None:
+            image, scale = as_inference_frame(frame).at_width(self.inference_width)
+        else:
+            # Only the court part of the frame goes through the model
+            frame = as_inference_frame(frame).frame
+            court_image, (offset_x, offset_y) = self.court_region.crop(frame)
+            image, scale = InferenceFrame(court_image).at_width(
+                self.court_region.scale_inference_width(self.inference_width, frame.shape))
+
+        if self.inference_width is None:
+            results = self.model.track(image, persist=True)[0]
+        else:
+            results = self.model.track(image, persist=True, imgsz=get_inference_image_size(image))[0]
         id_name_dict = results.names
 
         player_dict = {}
         for box in results.boxes:
             track_id = int(box.id.tolist()[0])
-            result = box.xyxy.tolist()[0]
+            x1, y1, x2, y2 = scale_bbox_to_original(box.xyxy.tolist()[0], scale)
+            result = [x1 + offset_x, y1 + offset_y, x2 + offset_x, y2 + offset_y]
             object_cls_id = box.cls.tolist()[0]
             object_cls_name = id_name_dict[object_cls_id]
-            if object_cls_name == "person":
-                player_dict[track_id] = result
+            if object_cls_name != "person":
+                continue
+            # People standing off the court are dropped right away
+            if self.court_region is not None and not self.court_region.contains(result):
+                continue
+            player_dict[track_id] = result
         
         return player_dict
 
-    def draw_bboxes(self,video_frames, player_detections):
+    @staticmethod
+    def draw_bboxes(video_frames, player_detections):
         output_video_frames = []
         for frame, player_dict in zip(video_frames, player_detections):
             # Draw Bounding Boxes
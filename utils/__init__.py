@@ -1,4 +1,50 @@
-from .video_utils import read_video, save_video
-from .bbox_utils import get_center_of_bbox, measure_distance, get_foot_position,get_closest_keypoint_index,get_height_of_bbox,measure_xy_distance,get_center_of_bbox
+from .bbox_utils import get_center_of_bbox, measure_distance, get_foot_position,get_closest_keypoint_index,get_height_of_bbox,measure_xy_distance,get_center_of_bbox,get_iou
 from .conversions import convert_pixel_distance_to_meters, convert_meters_to_pixel_distance
-from .player_stats_drawer_utils import draw_player_stats
\ No newline at end of file
+from .player_stats_utils import calculate_player_stats, build_player_stats_dataframe
+from .file_utils import write_pickle_atomic
+
+# Helpers that need cv2/numpy are imported on first use, so the geometry helpers import instantly
+_LAZY_ATTRIBUTES = {
+    'read_video': '.video_utils',
+    'save_video': '.video_utils',
+    'sample_video_frames': '.video_utils',
+    'iter_video_frames': '.video_utils',
+    'get_frame_range': '.video_utils',
+    'VideoFrameWriter': '.video_utils',
+    'draw_player_stats': '.player_stats_drawer_utils',
+    'draw_player_stats_on_frame': '.player_stats_drawer_utils',
+    'InferenceFrame': '.inference_scaling',
+    'as_inference_frame': '.inference_scaling',
+    'get_inference_image_size': '.inference_scaling',
+    'scale_bbox_to_original': '.inference_scaling',
+    'scale_keypoints_to_original': '.inference_scaling',
+    'get_analytics_path': '.analytics_export',
+    'export_match_analytics': '.analytics_export',
+    'load_match_analytics': '.analytics_export',
+    'as_keypoint_matrix': '.bbox_batch_utils',
+    'get_centers_of_bboxes': '.bbox_batch_utils',
+    'get_foot_positions': '.bbox_batch_utils',
+    'get_heights_of_bboxes': '.bbox_batch_utils',
+    'measure_distances': '.bbox_batch_utils',
+    'measure_xy_distances': '.bbox_batch_utils',
+    'get_min_distances_to_keypoints': '.bbox_batch_utils',
+    'get_closest_keypoint_indices': '.bbox_batch_utils',
+    'get_windowed_max': '.bbox_batch_utils',
+    'get_frame_cache_path': '.frame_cache',
+    'write_frame_cache': '.frame_cache',
+    'open_frame_cache': '.frame_cache',
+    'load_cached_video_frames': '.frame_cache',
+    'prune_frame_caches': '.frame_cache',
+}
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES))
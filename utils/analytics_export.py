@@ -0,0 +1,117 @@
+import os
+import numpy as np
+
+ANALYTICS_FORMATS = ('.npz', '.parquet')
+
+
+def get_analytics_path(output_video_path, extension='.npz'):
+    """e.g. ``output_videos/test1.avi`` -> ``output_videos/test1.analytics.npz``"""
+    if extension not in ANALYTICS_FORMATS:
+        raise ValueError(f"Unsupported analytics format: {extension}")
+    return os.path.splitext(output_video_path)[0] + '.analytics' + extension
+
+
+def _positions_to_columns(prefix, detections, names, num_frames):
+    """Turns per-frame ``{id: position}`` dicts into one float column per id and coordinate."""
+    track_ids = sorted({track_id for frame_detections in detections for track_id in frame_detections})
+    columns = {}
+    for track_id in track_ids:
+        values = np.full((num_frames, len(names)), np.nan, dtype=np.float32)
+        for frame_num, frame_detections in enumerate(detections[:num_frames]):
+            if track_id in frame_detections:
+                values[frame_num] = frame_detections[track_id]
+        for i, name in enumerate(names):
+            columns[f"{prefix(track_id)}{name}"] = values[:, i]
+    return columns
+
+
+def build_analytics_columns(player_detections, ball_detections, player_mini_court_detections,
+                            ball_mini_court_detections, ball_shot_frames, player_stats_data_df, first_frame_num=0):
+    """
+    Collects the per-frame results of a match into equal-length columns. ``frame_num``
+    counts from ``first_frame_num`` when only part of the video was analyzed.
+
+    Returns:
+        dict: Column name -> numpy array with one value per frame. Missing detections are NaN.
+    """
+    num_frames = len(player_stats_data_df)
+    columns = {'frame_num': np.arange(first_frame_num, first_frame_num + num_frames, dtype=np.int32)}
+
+    columns.update(_positions_to_columns(lambda track_id: f"player_{track_id}_", player_detections,
+                                         ['x1', 'y1', 'x2', 'y2'], num_frames))
+    columns.update(_positions_to_columns(lambda track_id: f"player_{track_id}_", player_mini_court_detections,
+                                         ['mini_court_x', 'mini_court_y'], num_frames))
+    columns.update(_positions_to_columns(lambda track_id: "ball_", ball_detections,
+                                         ['x1', 'y1', 'x2', 'y2'], num_frames))
+    columns.update(_positions_to_columns(lambda track_id: "ball_", ball_mini_court_detections,
+                                         ['mini_court_x', 'mini_court_y'], num_frames))
+
+    is_shot_frame = np.zeros(num_frames, dtype=bool)
+    is_shot_frame[[frame_num for frame_num in ball_shot_frames if frame_num < num_frames]] = True
+    columns['is_shot_frame'] = is_shot_frame
+
+    for column in player_stats_data_df.columns:
+        if column != 'frame_num':
+            columns[column] = player_stats_data_df[column].to_numpy(dtype=np.float64)
+
+    return columns
+
+
+def export_match_analytics(output_path, player_detections, ball_detections, player_mini_court_detections,
+                           ball_mini_court_detections, ball_shot_frames, player_stats_data_df, first_frame_num=0):
+    """
+    Writes the per-frame detections, mini court positions, shot events and cumulative
+    stats of a match. ``.npz`` stores one compressed array per column, ``.parquet``
+    needs pyarrow.
+    """
+    columns = build_analytics_columns(player_detections, ball_detections, player_mini_court_detections,
+                                      ball_mini_court_detections, ball_shot_frames, player_stats_data_df,
+                                      first_frame_num=first_frame_num)
+
+    if output_path.endswith('.parquet'):
+        import pandas as pd
+        pd.DataFrame(columns).to_parquet(output_path, index=False)
+    elif output_path.endswith('.npz'):
+        shot_frames = np.asarray(ball_shot_frames, dtype=np.int32) + first_frame_num
+        np.savez_compressed(output_path, shot_frames=shot_frames, **columns)
+    else:
+        raise ValueError(f"Unsupported analytics format: {output_path}")
+
+    return output_path
+
+
+def load_match_analytics(path, columns=None, frame_range=None):
+    """
+    Loads an analytics export, reading only the requested columns.
+
+    Args:
+        path (str): ``.npz`` or ``.parquet`` file written by ``export_match_analytics``.
+        columns (list): Column names to load, defaults to all of them.
+        frame_range (tuple): ``(start_frame, end_frame)`` video frame numbers, end exclusive.
+
+    Returns:
+        dict: Column name -> numpy array.
+    """
+    if path.endswith('.parquet'):
+        import pandas as pd
+        filters = None
+        if frame_range is not None:
+            filters = [('frame_num', '>=', frame_range[0]), ('frame_num', '<', frame_range[1])]
+        df = pd.read_parquet(path, columns=columns, filters=filters)
+        return {column: df[column].to_numpy() for column in df.columns}
+
+    # Arrays in an npz archive are only decompressed when accessed
+    with np.load(path) as archive:
+        names = columns if columns is not None else [name for name in archive.files if name != 'shot_frames']
+        result = {}
+        if frame_range is not None:
+            # Exports of part of a video start at its first frame, not at 0
+            frame_nums = archive['frame_num']
+            first_frame_num = int(frame_nums[0]) if len(frame_nums) else 0
+            row_range = (max(0, frame_range[0] - first_frame_num), max(0, frame_range[1] - first_frame_num))
+        for name in names:
+            values = archive[name]
+            if frame_range is not None and name != 'shot_frames':
+                values = values[row_range[0]:row_range[1]]
+            result[name] = values
+        return result
@@ -0,0 +1,79 @@
+import numpy as np
+
+# Array versions of the bbox_utils helpers, for many boxes or points at once. Boxes are
+# (N, 4) x1, y1, x2, y2 arrays and points (N, 2) x, y arrays. They round like the scalar
+# helpers (int() truncates towards zero), so both give the same numbers.
+
+
+def as_keypoint_matrix(keypoints):
+    """Flat [x0, y0, x1, y1, ...] keypoints (the court model output) as a (K, 2) matrix."""
+    return np.asarray(keypoints, dtype=float).reshape(-1, 2)
+
+
+def get_centers_of_bboxes(bboxes):
+    bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+    centers = np.stack([(bboxes[:, 0] + bboxes[:, 2]) / 2, (bboxes[:, 1] + bboxes[:, 3]) / 2], axis=1)
+    return centers.astype(int)
+
+
+def get_foot_positions(bboxes):
+    bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+    foot_x = ((bboxes[:, 0] + bboxes[:, 2]) / 2).astype(int)
+    return np.stack([foot_x, bboxes[:, 3]], axis=1)
+
+
+def get_heights_of_bboxes(bboxes):
+    bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+    return bboxes[:, 3] - bboxes[:, 1]
+
+
+def measure_distances(points1, points2):
+    """Distances between matching rows, a single (2,) point broadcasts against all rows."""
+    difference = np.asarray(points1, dtype=float) - np.asarray(points2, dtype=float)
+    return np.sqrt((difference ** 2).sum(axis=-1))
+
+
+def measure_xy_distances(points1, points2):
+    return np.abs(np.asarray(points1, dtype=float) - np.asarray(points2, dtype=float))
+
+
+def get_min_distances_to_keypoints(points, keypoints):
+    """Distance from every point to its nearest keypoint, ``keypoints`` is a (K, 2) matrix."""
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    return measure_distances(points[:, None, :], np.asarray(keypoints, dtype=float)[None, :, :]).min(axis=1)
+
+
+def get_closest_keypoint_indices(points, keypoints, keypoint_indices):
+    """
+    For every point, the keypoint among ``keypoint_indices`` closest in y, as
+    ``get_closest_keypoint_index`` does for one point.
+
+    Args:
+        points (array): (N, 2) points.
+        keypoints (array): (K, 2) keypoint matrix.
+        keypoint_indices (list): Candidate keypoint indices.
+
+    Returns:
+        numpy.ndarray: (N,) keypoint indices, ties go to the first candidate.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    keypoint_indices = np.asarray(keypoint_indices)
+    candidate_y = np.asarray(keypoints, dtype=float)[keypoint_indices, 1]
+    distances = np.abs(points[:, 1:2] - candidate_y[None, :])
+    # The scalar version never picks a NaN distance
+    distances[np.isnan(distances)] = np.inf
+    return keypoint_indices[np.argmin(distances, axis=1)]
+
+
+def get_windowed_max(values, window_before, window_after):
+    """
+    Max of ``values[i - window_before:i + window_after]`` (clipped to the array) for
+    every i, NaN values are ignored. Windows with no values give NaN.
+    """
+    values = np.where(np.isnan(values), -np.inf, np.asarray(values, dtype=float))
+    padded = np.concatenate([np.full(window_before, -np.inf), values, np.full(window_after - 1, -np.inf)])
+    window_max = np.full(len(values), -np.inf)
+    for offset in range(window_before + window_after):
+        np.maximum(window_max, padded[offset:offset + len(values)], out=window_max)
+    window_max[np.isneginf(window_max)] = np.nan
+    return window_max
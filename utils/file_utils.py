@@ -0,0 +1,13 @@
+import os
+import pickle
+
+
+def write_pickle_atomic(path, value):
+    """
+    Pickles ``value`` to ``path`` through a temporary file that is then renamed, so an
+    interrupted run never leaves a truncated file behind.
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
@@ -0,0 +1,181 @@
+import glob
+import hashlib
+import logging
+import os
+import struct
+import cv2
+import numpy as np
+
+# magic, version, frame count, height, width, channels, fps, padded so the frames start aligned
+FRAME_CACHE_MAGIC = b'TNFC'
+FRAME_CACHE_VERSION = 1
+_HEADER_FORMAT = '<4sIIIIId'
+_HEADER_SIZE = 64
+
+logger = logging.getLogger(__name__)
+
+
+class FrameCacheHeader:
+    def __init__(self, num_frames, height, width, channels, fps):
+        self.num_frames = num_frames
+        self.height = height
+        self.width = width
+        self.channels = channels
+        self.fps = fps
+
+    @property
+    def frame_shape(self):
+        return (self.height, self.width, self.channels)
+
+    def to_bytes(self):
+        header = struct.pack(_HEADER_FORMAT, FRAME_CACHE_MAGIC, FRAME_CACHE_VERSION, self.num_frames,
+                             self.height, self.width, self.channels, self.fps)
+        return header.ljust(_HEADER_SIZE, b'\0')
+
+    @staticmethod
+    def from_bytes(data):
+        magic, version, num_frames, height, width, channels, fps = struct.unpack_from(_HEADER_FORMAT, data)
+        if magic != FRAME_CACHE_MAGIC:
+            raise ValueError("Not a decoded frame cache file")
+        if version != FRAME_CACHE_VERSION:
+            raise ValueError(f"Unsupported frame cache version {version}")
+        return FrameCacheHeader(num_frames, height, width, channels, fps)
+
+
+def _get_video_cache_prefix(video_path, cache_dir):
+    # Shared by every version of the video, so caches of older versions can be found
+    name = os.path.splitext(os.path.basename(video_path))[0]
+    path_hash = hashlib.sha256(os.path.abspath(video_path).encode()).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{name}-{path_hash}-")
+
+
+def get_frame_cache_path(video_path, cache_dir):
+    """Cache file of a video, a changed video (size or modification time) gets a new file."""
+    stat = os.stat(video_path)
+    video_id = f"{os.path.abspath(video_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return f"{_get_video_cache_prefix(video_path, cache_dir)}{hashlib.sha256(video_id.encode()).hexdigest()[:16]}.frames"
+
+
+def estimate_frame_cache_bytes(video_path):
+    """Size the cache of a video will have, from the frame count and size in its metadata."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    finally:
+        cap.release()
+    return _HEADER_SIZE + num_frames * height * width * 3
+
+
+def prune_frame_caches(cache_dir, max_bytes, video_path=None, create=True):
+    """
+    Deletes the caches of older versions of ``video_path`` and then the least recently
+    used caches until the directory fits in ``max_bytes``, counting the cache that
+    ``video_path`` still needs unless ``create`` is False (e.g. a partial range, which
+    never writes one). The cache of ``video_path`` itself is never deleted.
+    """
+    if not os.path.isdir(cache_dir):
+        return
+
+    keep_path = None
+    needed_bytes = 0
+    if video_path is not None:
+        keep_path = get_frame_cache_path(video_path, cache_dir)
+        for stale_path in glob.glob(glob.escape(_get_video_cache_prefix(video_path, cache_dir)) + '*.frames'):
+            if stale_path != keep_path:
+                logger.info(f"Deleting {stale_path}, the video changed since it was decoded")
+                os.remove(stale_path)
+        if create and not os.path.exists(keep_path):
+            needed_bytes = estimate_frame_cache_bytes(video_path)
+
+    caches = []
+    total_bytes = needed_bytes
+    for cache_path in glob.glob(os.path.join(glob.escape(cache_dir), '*.frames')):
+        stat = os.stat(cache_path)
+        total_bytes += stat.st_size
+        if cache_path != keep_path:
+            caches.append((stat.st_mtime, cache_path, stat.st_size))
+
+    for _, cache_path, size in sorted(caches):
+        if total_bytes <= max_bytes:
+            break
+        logger.info(f"Deleting {cache_path}, the frame cache is over {max_bytes} bytes")
+        os.remove(cache_path)
+        total_bytes -= size
+
+
+def write_frame_cache(video_path, cache_path):
+    """Decodes the whole video once into a raw frame file, returns its header."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Unable to open video file: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+
+    # Written next to the final file and renamed, readers never see a partial cache
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    header = None
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(b'\0' * _HEADER_SIZE)
+            num_frames = 0
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                if header is None:
+                    header = FrameCacheHeader(0, frame.shape[0], frame.shape[1], frame.shape[2], fps)
+                f.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+                num_frames += 1
+
+            if header is None:
+                raise ValueError(f"No frames could be read from {video_path}")
+            header.num_frames = num_frames
+            f.seek(0)
+            f.write(header.to_bytes())
+        os.replace(temp_path, cache_path)
+    finally:
+        cap.release()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return header
+
+
+def open_frame_cache(cache_path, mode='r'):
+    """
+    Maps the cached frames into memory as a ``(frames, height, width, channels)`` uint8 array.
+
+    Nothing is read up front, the OS pages frames in when they are accessed and keeps
+    them in its page cache for other passes and processes. Frames are read-only, copy
+    the ones you draw on; a copy-on-write mapping would keep every drawn frame in
+    private memory until the mapping is closed.
+
+    Args:
+        cache_path (str): File written by ``write_frame_cache``.
+        mode (str): ``'r'`` read-only or ``'c'`` copy-on-write.
+
+    Returns:
+        tuple: (numpy.memmap of the frames, FrameCacheHeader)
+    """
+    with open(cache_path, 'rb') as f:
+        header = FrameCacheHeader.from_bytes(f.read(_HEADER_SIZE))
+    # The modification time records the last use, see prune_frame_caches
+    os.utime(cache_path)
+    frames = np.memmap(cache_path, dtype=np.uint8, mode=mode, offset=_HEADER_SIZE,
+                       shape=(header.num_frames,) + header.frame_shape)
+    return frames, header
+
+
+def load_cached_video_frames(video_path, cache_dir, mode='r', create=True):
+    """
+    Returns the memory-mapped frames of a video, decoding it into ``cache_dir`` the first time.
+    With ``create`` False a video that is not cached yet returns None instead.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = get_frame_cache_path(video_path, cache_dir)
+    if not os.path.exists(cache_path):
+        if not create:
+            return None
+        write_frame_cache(video_path, cache_path)
+    frames, _ = open_frame_cache(cache_path, mode=mode)
+    return frames
@@ -0,0 +1,64 @@
+import math
+import cv2
+
+
+class InferenceFrame:
+    """
+    A video frame together with the downscaled copies the models run on.
+
+    Each inference width is resized once per frame and cached, so models that share
+    a resolution share the resized image. Detections are mapped back to original
+    pixel coordinates with ``scale_bbox_to_original`` / ``scale_keypoints_to_original``.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.original_height, self.original_width = frame.shape[:2]
+        self.scaled_images = {}
+
+    def at_width(self, inference_width):
+        """
+        Returns the frame resized to ``inference_width`` (keeping the aspect ratio)
+        and the (x, y) factors that map its coordinates back to the original frame.
+        """
+        if inference_width is None or inference_width >= self.original_width:
+            return self.frame, (1.0, 1.0)
+
+        if inference_width not in self.scaled_images:
+            inference_height = max(1, round(self.original_height * inference_width / self.original_width))
+            self.scaled_images[inference_width] = cv2.resize(self.frame, (inference_width, inference_height),
+                                                             interpolation=cv2.INTER_AREA)
+
+        image = self.scaled_images[inference_width]
+        return image, (self.original_width / image.shape[1], self.original_height / image.shape[0])
+
+    def source_for(self, min_size):
+        """Returns the smallest image already available with both sides at least ``min_size``."""
+        candidates = [image for image in self.scaled_images.values() if min(image.shape[:2]) >= min_size]
+        if not candidates:
+            return self.frame
+        return min(candidates, key=lambda image: image.shape[1])
+
+
+def as_inference_frame(frame):
+    if isinstance(frame, InferenceFrame):
+        return frame
+    return InferenceFrame(frame)
+
+
+def get_inference_image_size(image, stride=32):
+    """The ultralytics ``imgsz`` that keeps a downscaled image at its own resolution."""
+    return int(math.ceil(max(image.shape[:2]) / stride) * stride)
+
+
+def scale_bbox_to_original(bbox, scale):
+    scale_x, scale_y = scale
+    x1, y1, x2, y2 = bbox
+    return [x1 * scale_x, y1 * scale_y, x2 * scale_x, y2 * scale_y]
+
+
+def scale_keypoints_to_original(keypoints, scale):
+    scale_x, scale_y = scale
+    keypoints[::2] *= scale_x
+    keypoints[1::2] *= scale_y
+    return keypoints
@@ -0,0 +1,103 @@
+from copy import deepcopy
+import sys
+sys.path.append('../')
+import constants
+from .bbox_utils import measure_distance
+from .conversions import convert_pixel_distance_to_meters
+
+
+def _has_ball(ball_mini_court_detections, frame_num):
+    return frame_num < len(ball_mini_court_detections) and 1 in ball_mini_court_detections[frame_num]
+
+
+def calculate_player_stats(ball_shot_frames, player_mini_court_detections, ball_mini_court_detections,
+                           mini_court_width, fps=24):
+    """
+    Builds the cumulative player stats, one row at the start and one more per shot.
+
+    Returns:
+        list: Dicts with the shot counts and the total/last shot and player speeds (km/h).
+    """
+    player_stats_data = [{
+        'frame_num': 0,
+        'player_1_number_of_shots': 0,
+        'player_1_total_shot_speed': 0,
+        'player_1_last_shot_speed': 0,
+        'player_1_total_player_speed': 0,
+        'player_1_last_player_speed': 0,
+        'player_2_number_of_shots': 0,
+        'player_2_total_shot_speed': 0,
+        'player_2_last_shot_speed': 0,
+        'player_2_total_player_speed': 0,
+        'player_2_last_player_speed': 0,
+    }]
+
+    for ball_shot_ind in range(len(ball_shot_frames) - 1):
+        start_frame = ball_shot_frames[ball_shot_ind]
+        end_frame = ball_shot_frames[ball_shot_ind + 1]
+        ball_shot_time_in_seconds = (end_frame - start_frame) / fps
+
+        # Get distance covered by the ball
+        if _has_ball(ball_mini_court_detections, start_frame) and _has_ball(ball_mini_court_detections, end_frame):
+            distance_covered_by_ball_pixels = measure_distance(ball_mini_court_detections[start_frame][1],
+                                                               ball_mini_court_detections[end_frame][1])
+            distance_covered_by_ball_meters = convert_pixel_distance_to_meters(
+                distance_covered_by_ball_pixels,
+                constants.DOUBLE_LINE_WIDTH,
+                mini_court_width
+            )
+
+            # Speed of the ball shot in km/h
+            speed_of_ball_shot = distance_covered_by_ball_meters / ball_shot_time_in_seconds * 3.6
+
+            # Player who shot the ball
+            player_positions = player_mini_court_detections[start_frame]
+            player_shot_ball = min(player_positions.keys(),
+                                   key=lambda player_id: measure_distance(player_positions[player_id],
+                                                                          ball_mini_court_detections[start_frame][1]))
+
+            # Opponent player speed
+            opponent_player_id = 1 if player_shot_ball == 2 else 2
+            if opponent_player_id in player_mini_court_detections[start_frame] and opponent_player_id in player_mini_court_detections[end_frame]:
+                distance_covered_by_opponent_pixels = measure_distance(
+                    player_mini_court_detections[start_frame][opponent_player_id],
+                    player_mini_court_detections[end_frame][opponent_player_id]
+                )
+                distance_covered_by_opponent_meters = convert_pixel_distance_to_meters(
+                    distance_covered_by_opponent_pixels,
+                    constants.DOUBLE_LINE_WIDTH,
+                    mini_court_width
+                )
+                speed_of_opponent = distance_covered_by_opponent_meters / ball_shot_time_in_seconds * 3.6
+            else:
+                speed_of_opponent = 0  # Set default value if opponent player data is missing
+
+            current_player_stats = deepcopy(player_stats_data[-1])
+            current_player_stats['frame_num'] = start_frame
+            current_player_stats[f'player_{player_shot_ball}_number_of_shots'] += 1
+            current_player_stats[f'player_{player_shot_ball}_total_shot_speed'] += speed_of_ball_shot
+            current_player_stats[f'player_{player_shot_ball}_last_shot_speed'] = speed_of_ball_shot
+
+            current_player_stats[f'player_{opponent_player_id}_total_player_speed'] += speed_of_opponent
+            current_player_stats[f'player_{opponent_player_id}_last_player_speed'] = speed_of_opponent
+
+            player_stats_data.append(current_player_stats)
+
+    return player_stats_data
+
+
+def build_player_stats_dataframe(player_stats_data, num_frames):
+    """Spreads the stats rows over every frame and adds the average speeds."""
+    import pandas as pd
+
+    player_stats_data_df = pd.DataFrame(player_stats_data)
+    frames_df = pd.DataFrame({'frame_num': list(range(num_frames))})
+    player_stats_data_df = pd.merge(frames_df, player_stats_data_df, on='frame_num', how='left')
+    player_stats_data_df = player_stats_data_df.ffill()
+
+    player_stats_data_df['player_1_average_shot_speed'] = player_stats_data_df['player_1_total_shot_speed'] / player_stats_data_df['player_1_number_of_shots']
+    player_stats_data_df['player_2_average_shot_speed'] = player_stats_data_df['player_2_total_shot_speed'] / player_stats_data_df['player_2_number_of_shots']
+    player_stats_data_df['player_1_average_player_speed'] = player_stats_data_df['player_1_total_player_speed'] / player_stats_data_df['player_2_number_of_shots']
+    player_stats_data_df['player_2_average_player_speed'] = player_stats_data_df['player_2_total_player_speed'] / player_stats_data_df['player_1_number_of_shots']
+
+    return player_stats_data_df
@@ -0,0 +1,267 @@
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Header layout (int64): state, frame count once closed, then (sequence, readers left) per slot
+_STATE = 0
+_FRAME_COUNT = 1
+_SLOTS_START = 2
+
+_OPEN = 0
+_CLOSED = 1
+_ABORTED = 2
+
+
+class SharedFrameRingBuffer:
+    """
+    Fixed-shape uint8 frame slots in shared memory, written by one decoder and read
+    in place by several worker processes.
+
+    A slot belongs to the writer while no reader holds it. Once a frame is committed
+    the slot records the frame's sequence number and how many readers still have to
+    release it; the writer only reuses it after every reader did. Frames never go
+    through pickling or a pipe, the decoder writes each one once and every reader
+    sees the same memory.
+
+    Create it in the parent process and pass it to ``multiprocessing.Process`` as an
+    argument, the workers attach to the same shared memory.
+
+    Args:
+        num_slots (int): Number of frames in flight.
+        frame_shape (tuple): Shape of every frame, e.g. ``(1080, 1920, 3)``.
+        num_readers (int): Number of readers that each read every frame.
+        context: multiprocessing context the workers are started with.
+    """
+
+    def __init__(self, num_slots, frame_shape, num_readers, context=None):
+        context = context or multiprocessing.get_context()
+        self.num_slots = num_slots
+        self.frame_shape = tuple(frame_shape)
+        self.num_readers = num_readers
+        self.condition = context.Condition()
+
+        frame_bytes = int(np.prod(self.frame_shape))
+        self.frames_memory = shared_memory.SharedMemory(create=True, size=frame_bytes * num_slots)
+        self.header_memory = shared_memory.SharedMemory(create=True, size=8 * (_SLOTS_START + 2 * num_slots))
+        self.is_owner = True
+        self._attach_arrays()
+
+        self.header[:] = 0
+        self.header[_SLOTS_START::2] = -1
+        self.next_write_sequence = 0
+
+    def _attach_arrays(self):
+        self.frames = np.ndarray((self.num_slots,) + self.frame_shape, dtype=np.uint8, buffer=self.frames_memory.buf)
+        self.header = np.ndarray((_SLOTS_START + 2 * self.num_slots,), dtype=np.int64, buffer=self.header_memory.buf)
+
+    def __getstate__(self):
+        return {
+            'num_slots': self.num_slots,
+            'frame_shape': self.frame_shape,
+            'num_readers': self.num_readers,
+            'condition': self.condition,
+            'frames_name': self.frames_memory.name,
+            'header_name': self.header_memory.name,
+        }
+
+    def __setstate__(self, state):
+        self.num_slots = state['num_slots']
+        self.frame_shape = state['frame_shape']
+        self.num_readers = state['num_readers']
+        self.condition = state['condition']
+        self.frames_memory = shared_memory.SharedMemory(name=state['frames_name'])
+        self.header_memory = shared_memory.SharedMemory(name=state['header_name'])
+        self.is_owner = False
+        self.next_write_sequence = 0
+        self._attach_arrays()
+
+    def _slot_sequence_index(self, slot):
+        return _SLOTS_START + 2 * slot
+
+    def _check_aborted(self):
+        if self.header[_STATE] == _ABORTED:
+            raise RuntimeError("The frame producer failed, the ring buffer was aborted")
+
+    # Writer side
+
+    def acquire_write_slot(self, timeout=None):
+        """
+        Waits until the slot of the next frame is released by every reader.
+
+        Returns:
+            tuple: (sequence number, writable view of the slot), decode straight into the view.
+        """
+        sequence = self.next_write_sequence
+        slot = sequence % self.num_slots
+        readers_left_index = self._slot_sequence_index(slot) + 1
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.header[readers_left_index] == 0 or self.header[_STATE] == _ABORTED,
+                                           timeout):
+                raise TimeoutError(f"Readers did not release slot {slot} in time")
+            self._check_aborted()
+        return sequence, self.frames[slot]
+
+    def commit_write(self, sequence):
+        """Publishes the frame written into the slot of ``sequence`` to the readers."""
+        slot = sequence % self.num_slots
+        sequence_index = self._slot_sequence_index(slot)
+        with self.condition:
+            self.header[sequence_index] = sequence
+            self.header[sequence_index + 1] = self.num_readers
+            self.condition.notify_all()
+        self.next_write_sequence = sequence + 1
+
+    def write(self, frame, timeout=None):
+        """Copies a frame into the next slot, prefer decoding into ``acquire_write_slot`` directly."""
+        sequence, slot_frame = self.acquire_write_slot(timeout)
+        slot_frame[...] = frame
+        self.commit_write(sequence)
+        return sequence
+
+    def close(self):
+        """Tells the readers that no more frames will be written."""
+        with self.condition:
+            self.header[_FRAME_COUNT] = self.next_write_sequence
+            self.header[_STATE] = _CLOSED
+            self.condition.notify_all()
+
+    def abort(self):
+        """Makes every waiting reader and writer raise, e.g. after a worker failed."""
+        with self.condition:
+            self.header[_STATE] = _ABORTED
+            self.condition.notify_all()
+
+    # Reader side
+
+    def acquire_read(self, sequence, timeout=None):
+        """
+        Waits for frame ``sequence``.
+
+        Returns:
+            numpy.ndarray: Read-only view of the frame, valid until ``release_read``,
+            or None when the buffer was closed before that frame.
+        """
+        slot = sequence % self.num_slots
+        sequence_index = self._slot_sequence_index(slot)
+
+        def is_ready():
+            return (self.header[sequence_index] == sequence
+                    or self.header[_STATE] == _ABORTED
+                    or (self.header[_STATE] == _CLOSED and sequence >= self.header[_FRAME_COUNT]))
+
+        with self.condition:
+            if not self.condition.wait_for(is_ready, timeout):
+                raise TimeoutError(f"Frame {sequence} was not written in time")
+            self._check_aborted()
+            if self.header[sequence_index] != sequence:
+                return None
+
+        frame = self.frames[slot]
+        frame.flags.writeable = False
+        return frame
+
+    def release_read(self, sequence):
+        """Gives the slot of ``sequence`` back, every reader has to release every frame it read."""
+        slot = sequence % self.num_slots
+        readers_left_index = self._slot_sequence_index(slot) + 1
+        with self.condition:
+            self.header[readers_left_index] -= 1
+            if self.header[readers_left_index] == 0:
+                self.condition.notify_all()
+
+    def iter_frames(self, timeout=None):
+        """
+        Yields ``(sequence, frame)`` for every frame, releasing each one when the next is requested.
+        Copy a frame if it has to outlive the iteration step.
+        """
+        sequence = 0
+        while True:
+            frame = self.acquire_read(sequence, timeout)
+            if frame is None:
+                return
+            try:
+                yield sequence, frame
+            finally:
+                self.release_read(sequence)
+            sequence += 1
+
+    def release(self):
+        """
+        Detaches from the shared memory, the creating process also frees it. Drop every
+        frame view first; while one is still alive the mapping stays until the process exits.
+        """
+        self.frames = None
+        self.header = None
+        for memory in (self.frames_memory, self.header_memory):
+            try:
+                memory.close()
+            except BufferError:
+                logger.warning(f"Shared memory {memory.name} is still referenced by a frame view, "
+                               "it is unmapped when the process exits")
+        if self.is_owner:
+            self.frames_memory.unlink()
+            self.header_memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def decode_video_to_ring_buffer(video_path, ring_buffer, frame_cache_dir=None, start_frame=0, end_frame=None):
+    """Decodes every frame (of the range) straight into the ring buffer slots, then closes the buffer."""
+    import cv2
+
+    if frame_cache_dir is not None:
+        from .video_utils import iter_video_frames
+        try:
+            # Already decoded, copy the cached frames into the slots
+            for frame in iter_video_frames(video_path, frame_cache_dir, start_frame, end_frame):
+                ring_buffer.write(frame)
+            ring_buffer.close()
+        except BaseException:
+            ring_buffer.abort()
+            raise
+        return
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        ring_buffer.abort()
+        raise IOError(f"Unable to open video file: {video_path}")
+
+    try:
+        if start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        frame_num = start_frame
+        while end_frame is None or frame_num < end_frame:
+            sequence, slot_frame = ring_buffer.acquire_write_slot()
+            ret, frame = cap.read(slot_frame)
+            if not ret:
+                break
+            # OpenCV decodes into the slot, it only allocates a new array if the shape changed
+            if frame is not slot_frame:
+                slot_frame[...] = frame
+            ring_buffer.commit_write(sequence)
+            frame_num += 1
+        ring_buffer.close()
+    except BaseException:
+        ring_buffer.abort()
+        raise
+    finally:
+        cap.release()
+
+
+def get_video_frame_shape(video_path):
+    """Shape of the decoded frames, read from the first frame."""
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    ret, frame = cap.read()
+    cap.release()
+    if not ret:
+        raise IOError(f"Unable to read video file: {video_path}")
+    return frame.shape
@@ -1,33 +1,153 @@
+import math
 import cv2
+import numpy as np
 
-def read_video(video_path):
+def read_video(video_path, frame_cache_dir=None, start_frame=0, end_frame=None):
     # Check if the video path is valid
     if not video_path:
         raise ValueError("The video path is empty or invalid.")
-    
+
+    # Read-only memory-mapped frames from the decoded-frame cache, indexed like the list below
+    if frame_cache_dir is not None:
+        cached_frames = _load_cached_frame_range(video_path, frame_cache_dir, start_frame, end_frame)
+        if cached_frames is not None:
+            return cached_frames
+
+    return list(iter_video_frames(video_path, start_frame=start_frame, end_frame=end_frame))
+
+def _load_cached_frame_range(video_path, frame_cache_dir, start_frame=0, end_frame=None):
+    from .frame_cache import load_cached_video_frames
+
+    # Decoding the whole video for part of it costs more than decoding just the part, so a
+    # range only reads a cache an earlier whole-video pass wrote
+    whole_video = start_frame == 0 and (end_frame is None or end_frame >= get_video_frame_count(video_path))
+    frames = load_cached_video_frames(video_path, frame_cache_dir, create=whole_video)
+    if frames is None:
+        return None
+    return frames[start_frame:end_frame]
+
+def get_video_frame_count(video_path):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Unable to open video file: {video_path}")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return total_frames
+
+def get_frame_range(video_path, start_time=None, end_time=None, start_frame=None, end_frame=None):
+    """
+    Resolves a time range in seconds or a frame range to ``(start_frame, end_frame)``,
+    end exclusive and clipped to the video. Frames take precedence over times.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Unable to open video file: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 24
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    if start_frame is None:
+        start_frame = int(start_time * fps) if start_time is not None else 0
+    if end_frame is None:
+        end_frame = int(math.ceil(end_time * fps)) if end_time is not None else total_frames
+
+    start_frame = min(max(0, start_frame), total_frames)
+    end_frame = min(max(start_frame, end_frame), total_frames)
+    if start_frame == end_frame:
+        raise ValueError(f"Empty frame range {start_frame}-{end_frame} of {video_path}")
+    return start_frame, end_frame
+
+def sample_video_frames(video_path, num_frames, frame_cache_dir=None):
+    """Reads ``num_frames`` frames spread evenly over the video, e.g. for calibration or benchmarks."""
+    if frame_cache_dir is not None:
+        from .frame_cache import load_cached_video_frames
+
+        # Only an existing cache is used, a few frames are not worth decoding the whole video
+        frames = load_cached_video_frames(video_path, frame_cache_dir, create=False)
+        if frames is not None:
+            step = max(1, len(frames) // max(1, num_frames))
+            return [np.array(frame) for frame in frames[::step][:num_frames]]
+
     cap = cv2.VideoCapture(video_path)
-    
-    # Confirm that the video has been successfully opened
     if not cap.isOpened():
         raise IOError(f"Unable to open video file: {video_path}")
-    
+
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    step = max(1, total_frames // max(1, num_frames))
+
     frames = []
-    while True:
+    for frame_num in range(0, total_frames, step):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
         ret, frame = cap.read()
         if not ret:
             break
         frames.append(frame)
+        if len(frames) == num_frames:
+            break
     cap.release()
     return frames
 
+def iter_video_frames(video_path, frame_cache_dir=None, start_frame=0, end_frame=None, writable=False):
+    """
+    Decodes the video one frame at a time instead of holding every frame in memory.
+    ``start_frame`` seeks straight to the first frame, ``end_frame`` is exclusive.
+
+    Frames from the decoded-frame cache are read-only views of it; ``writable`` copies
+    each one for callers that draw on the frames.
+    """
+    if not video_path:
+        raise ValueError("The video path is empty or invalid.")
+
+    if frame_cache_dir is not None:
+        cached_frames = _load_cached_frame_range(video_path, frame_cache_dir, start_frame, end_frame)
+        if cached_frames is not None:
+            for frame in cached_frames:
+                # One frame at a time, the copies are freed as the caller moves on
+                yield np.array(frame) if writable else np.asarray(frame)
+            return
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Unable to open video file: {video_path}")
+
+    try:
+        if start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        frame_num = start_frame
+        while end_frame is None or frame_num < end_frame:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+            frame_num += 1
+    finally:
+        cap.release()
+
+class VideoFrameWriter:
+    """Encodes frames one at a time, the writer is opened with the size of the first frame."""
+
+    def __init__(self, output_video_path, fps=24):
+        self.output_video_path = output_video_path
+        self.fps = fps
+        self.out = None
+
+    def write(self, frame):
+        if self.out is None:
+            fourcc = cv2.VideoWriter_fourcc(*'MJPG')
+            self.out = cv2.VideoWriter(self.output_video_path, fourcc, self.fps, (frame.shape[1], frame.shape[0]))
+        self.out.write(frame)
+
+    def release(self):
+        if self.out is None:
+            raise ValueError("No frames available to save.")
+        self.out.release()
+
 def save_video(output_video_frames, output_video_path):
     # Check for empty frames to prevent errors in VideoWriter initialization
-    if not output_video_frames:
+    if len(output_video_frames) == 0:
         raise ValueError("No frames available to save.")
-    
-    fourcc = cv2.VideoWriter_fourcc(*'MJPG')
-    out = cv2.VideoWriter(output_video_path, fourcc, 24, (output_video_frames[0].shape[1], output_video_frames[0].shape[0]))
-    
+
+    writer = VideoFrameWriter(output_video_path, fps=24)
     for frame in output_video_frames:
-        out.write(frame)
-    out.release()
+        writer.write(frame)
+    writer.release()